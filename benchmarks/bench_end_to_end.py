@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from peewee import SqliteDatabase
+
+from benchmarks.fakes import FakeVendors, mention_texts, pick_symbol
+from src import bot, const, models
+from src.models import Outbox, PooledMedia, Reminder
+
+
+SCENARIOS = {
+    "mentions_1k": dict(mentions=1000, concentration=0.0),
+    "mentions_1k_concentrated": dict(mentions=1000, concentration=0.5),
+    "reminders_10k": dict(reminders=10000, concentration=0.0),
+    "reminders_10k_concentrated": dict(reminders=10000, concentration=0.5),
+}
+
+
+def setup_database():
+    database = SqliteDatabase(":memory:", thread_safe=False, check_same_thread=False)
+    tables = [
+        model
+        for model in vars(models).values()
+        if isinstance(model, type)
+        and issubclass(model, models.BaseModel)
+        and model not in (models.BaseModel, models.ClaimableModel)
+    ]
+    database.bind(tables)
+    database.connect()
+    database.create_tables(tables)
+
+
+def create_due_reminders(count, concentration, rng):
+    today = date.today()
+    remind_on = datetime.now() - timedelta(minutes=1)
+    Reminder.create_many(
+        [
+            {
+                "user_name": "user_name",
+                "tweet_id": index,
+                "created_on": today - timedelta(days=rng.randint(30, 720)),
+                "remind_on": remind_on,
+                "stock_symbol": pick_symbol(rng, concentration),
+                "stock_price": round(rng.uniform(10, 5000), 2),
+                "short": rng.random() < 0.1,
+            }
+            for index in range(count)
+        ]
+    )
+
+
+def drain_outbox():
+    while Outbox.pending().exists():
+        bot.send_outbox()
+
+
+def timed(func):
+    started_at = time.perf_counter()
+    func()
+    return round(time.perf_counter() - started_at, 3)
+
+
+def run(name, latency):
+    scenario = SCENARIOS[name]
+    rng = random.Random(0)
+    fakes = FakeVendors(latency / 1000)
+    setup_database()
+    with fakes.install():
+        # The media pool is filled by its own job before reminders come due
+        bot.refresh_media_pool()
+        fakes.calls.clear()
+        if "mentions" in scenario:
+            fakes.add_mentions(
+                mention_texts(scenario["mentions"], scenario["concentration"], rng)
+            )
+            cycle_seconds = timed(bot.reply_to_mentions)
+        else:
+            create_due_reminders(scenario["reminders"], scenario["concentration"], rng)
+            cycle_seconds = timed(bot.publish_reminders)
+        outbox_seconds = timed(drain_outbox)
+    return {
+        "cycle_seconds": cycle_seconds,
+        "outbox_seconds": outbox_seconds,
+        "statuses": len(fakes.statuses),
+        "reminders": Reminder.select().count(),
+        "pooled_media": PooledMedia.select().count(),
+        "vendor_calls": dict(sorted(fakes.calls.items())),
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def run_all(names, latency):
+    results = {}
+    for name in names:
+        # Each scenario runs in its own process so peak RSS isn't shared
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_end_to_end",
+                "--run",
+                name,
+                "--latency-ms",
+                str(latency),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results[name] = json.loads(output)
+        print(f"{name:<28} {results[name]['cycle_seconds']:8.2f} s", file=sys.stderr)
+    return {
+        "python": platform.python_version(),
+        "latency_ms": latency,
+        "mention_workers": int(
+            os.environ.get("MENTION_WORKERS", const.MENTION_WORKERS)
+        ),
+        "scenarios": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Drive the bot end to end against in-process fake vendors"
+    )
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS))
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.environ.setdefault("FMP_API_KEY", "benchmark")
+    os.environ.setdefault("GIPHY_API_KEY", "benchmark")
+    os.environ.setdefault("BOT_USER_ID", "1")
+    if args.run:
+        print(json.dumps(run(args.run, args.latency_ms)))
+    else:
+        report = json.dumps(
+            run_all(args.scenarios, args.latency_ms), indent=2, sort_keys=True
+        )
+        if args.output:
+            with open(args.output, "w") as output:
+                output.write(report + "\n")
+        else:
+            print(report)
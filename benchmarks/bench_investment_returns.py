@@ -0,0 +1,74 @@
+import random
+import timeit
+from datetime import date, datetime
+
+from src import bot, returns
+from src.models import Reminder
+
+
+REMINDERS = 10000
+
+ROUNDS = 5
+
+
+def make_batch():
+    rng = random.Random(0)
+    reminders = [
+        Reminder(
+            user_name="user_name",
+            tweet_id=index,
+            created_on=date(2020, rng.randint(1, 12), 15),
+            remind_on=datetime(2021, 1, 15, 16, 52),
+            stock_symbol="AMZN",
+            stock_price=round(rng.uniform(1, 5000), 2),
+            short=rng.random() < 0.2,
+        )
+        for index in range(REMINDERS)
+    ]
+    current_prices = [round(rng.uniform(1, 5000), 2) for _ in reminders]
+    split_factors = [rng.choice([1.0, 1.0, 2.0, 5.0]) for _ in reminders]
+    dividends = [round(rng.uniform(0, 5), 2) * (rng.random() < 0.3) for _ in reminders]
+    return reminders, current_prices, split_factors, dividends
+
+
+def scalar(reminders, current_prices, split_factors, dividends):
+    return [
+        (reminder, bot.generate_investment_results(reminder, *figures))
+        for reminder, figures in zip(
+            reminders, zip(current_prices, split_factors, dividends)
+        )
+    ]
+
+
+def scalar_figures(reminders, current_prices, split_factors, dividends):
+    figures = []
+    for reminder, current_price, split_factor, dividend in zip(
+        reminders, current_prices, split_factors, dividends
+    ):
+        adjusted_price = reminder.stock_price / split_factor
+        rate = bot.calculate_returns(adjusted_price, current_price, dividend)
+        figures.append((adjusted_price, -rate if reminder.short else rate))
+    return figures
+
+
+def batch_figures(reminders, current_prices, split_factors, dividends):
+    return returns.investment_returns(
+        [reminder.stock_price for reminder in reminders],
+        split_factors,
+        dividends,
+        current_prices,
+        [reminder.short for reminder in reminders],
+    )
+
+
+if __name__ == "__main__":
+    batch = make_batch()
+    assert scalar(*batch) == bot.generate_investment_results_batch(*batch)
+    for name, func in (
+        ("scalar returns", scalar_figures),
+        ("batch returns", batch_figures),
+        ("scalar statuses", scalar),
+        ("batch statuses", bot.generate_investment_results_batch),
+    ):
+        seconds = timeit.timeit(lambda: func(*batch), number=ROUNDS) / ROUNDS
+        print(f"{name:<16} {seconds * 1000:8.1f} ms per {REMINDERS} reminders")
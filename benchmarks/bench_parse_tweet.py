@@ -0,0 +1,53 @@
+import re
+import timeit
+
+from dateutil.parser import parse
+
+from src import const, tokenizer
+
+
+TWEETS = [
+    "@stock_reminder $AMZN in 3 months",
+    "@stock_reminder Remind me of $TSLA and $NIO in 2 years",
+    "@stock_reminder short $GME next friday",
+    "@stock_reminder $msft 1/28/2021",
+    "@stock_reminder what do you think about $AAPL? analysis please",
+    "@stock_reminder $BTC on March 3rd at 3pm",
+    "@stock_reminder hello there, how are you doing today?",
+    "@stock_reminder $ETH is a great buy at $2000",
+]
+
+ROUNDS = 2000
+
+
+def legacy_intent(tweet):
+    # The per-predicate checks the bot ran before the tokenizer
+    contains_stock = const.CASHTAG in tweet
+    demands_report = (
+        any(keyword in tweet.lower() for keyword in const.REPORT_KEYWORDS)
+        and contains_stock
+    )
+    contains_date = any(string in tweet for string in const.DATE_TIME_STRINGS)
+    if not contains_date:
+        try:
+            parse(tweet, fuzzy=True)
+            contains_date = True
+        except ValueError:
+            contains_date = False
+    is_valid = demands_report or contains_stock and contains_date
+    return is_valid, re.findall(r"[$][A-Za-z]+", tweet), "short" in tweet.lower()
+
+
+def tokenizer_intent(tweet):
+    intent = tokenizer.tokenize(tweet)
+    return tokenizer.is_valid(intent), intent.cashtags, intent.is_short
+
+
+def per_mention_microseconds(func):
+    seconds = timeit.timeit(lambda: [func(tweet) for tweet in TWEETS], number=ROUNDS)
+    return seconds / (ROUNDS * len(TWEETS)) * 1e6
+
+
+if __name__ == "__main__":
+    for name, func in (("legacy", legacy_intent), ("tokenizer", tokenizer_intent)):
+        print(f"{name:<10} {per_mention_microseconds(func):8.2f} us/mention")
@@ -0,0 +1,39 @@
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from src import bot, const
+
+
+ROUNDS = 20
+
+REPORT = dict(
+    {field: "$1,234.56" for field in const.REPORT_FIELDS},
+    Name="Amazon.com Inc",
+    Industry="Retail-Catalog & Mail-Order Houses",
+)
+
+
+def run(renderer):
+    os.environ["REPORT_RENDERER"] = renderer
+    bot.save_report_to_image(REPORT)
+    started_at = time.perf_counter()
+    for _ in range(ROUNDS):
+        bot.save_report_to_image(REPORT)
+    latency = (time.perf_counter() - started_at) / ROUNDS * 1000
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{renderer:<16} {latency:8.2f} ms/report {peak_rss:8.1f} MB peak RSS")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        # Each renderer runs in its own process so peak RSS isn't shared
+        for renderer in (const.DATAFRAME_IMAGE_RENDERER, const.PILLOW_RENDERER):
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_report_render", renderer],
+                check=True,
+            )
@@ -0,0 +1,239 @@
+import itertools
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import ExitStack
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from tweepy import Status, User
+
+from src import bot, const, vendors
+
+
+SYMBOLS = ["".join(letters) for letters in itertools.product("ABCDEFGHIJ", repeat=3)]
+
+GIF_BYTES = b"GIF89a\x01\x00\x01\x00\x00\x00\x00;"
+
+TICKERS = 100
+
+HOT_SYMBOL = SYMBOLS[0]
+
+MENTION_TEMPLATES = [
+    (0.8, "Remind me of ${symbol} in 3 months"),
+    (0.05, "Short ${symbol} remind me in 1 year"),
+    (0.1, "Report for ${symbol}"),
+    (0.05, "What should I buy?"),
+]
+
+
+def pick_symbol(rng, concentration):
+    if rng.random() < concentration:
+        return HOT_SYMBOL
+    return rng.choice(SYMBOLS[:TICKERS])
+
+
+def mention_texts(count, concentration, rng):
+    weights, templates = zip(*MENTION_TEMPLATES)
+    return [
+        rng.choices(templates, weights)[0].format(
+            symbol=pick_symbol(rng, concentration)
+        )
+        for _ in range(count)
+    ]
+
+
+def price_of(symbol, day=None):
+    # Prices only depend on the symbol and day so every run sees the same market
+    seed = zlib.crc32(f"{symbol}{day or ''}".encode())
+    return round(10 + seed % 500000 / 100, 2)
+
+
+def company_overview(symbol):
+    seed = zlib.crc32(symbol.encode())
+    overview = {
+        field: f"{seed % (index + 97) / 10:.2f}"
+        for index, field in enumerate(const.REPORT_FIELDS)
+    }
+    overview.update(
+        Symbol=symbol,
+        Name=f"{symbol} Holdings Inc",
+        Industry="Services-Prepackaged Software",
+        LastSplitFactor="2:1",
+        LastSplitDate=(date.today() - timedelta(days=seed % 720)).isoformat(),
+    )
+    return overview
+
+
+def daily_adjusted(symbol, days):
+    today = date.today()
+    series = {}
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        if day.weekday() in const.WEEKEND_DAYS:
+            continue
+        dividend = 0.25 if day.day == 15 and day.month % 3 == 0 else 0.0
+        series[day.isoformat()] = {
+            "1. open": f"{price_of(symbol, day):.4f}",
+            "4. close": f"{price_of(symbol, day):.4f}",
+            "5. adjusted close": f"{price_of(symbol, day):.4f}",
+            "7. dividend amount": f"{dividend:.4f}",
+            "8. split coefficient": "1.0",
+        }
+    return series
+
+
+def rating(symbol):
+    seed = zlib.crc32(symbol.encode())
+    return {
+        "symbol": symbol,
+        "rating": {
+            "score": seed % 5 + 1,
+            "rating": "ABCDS"[seed % 5],
+            "recommendation": ["Strong Buy", "Buy", "Neutral", "Sell"][seed % 4],
+        },
+    }
+
+
+class Response:
+    def __init__(self, payload=None, content=b""):
+        self.payload = payload
+        self.content = content
+        self.status_code = 200
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeVendors:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.mentions = []
+        self.statuses = []
+        self.media_ids = itertools.count(1)
+
+    def call(self, vendor, endpoint):
+        with self.lock:
+            self.calls[f"{vendor}.{endpoint}"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add_mentions(self, texts):
+        user = User()
+        user.screen_name = "user_name"
+        for text in texts:
+            mention = Status()
+            mention.id = len(self.mentions) + 1
+            mention.text = text
+            mention.user = user
+            mention.in_reply_to_status_id = None
+            self.mentions.append(mention)
+
+    # Twitter
+
+    def mentions_timeline(self, since_id=None, max_id=None, count=20):
+        self.call(const.TWITTER, "mentions_timeline")
+        page = [
+            mention
+            for mention in reversed(self.mentions)
+            if mention.id > (since_id or 0) and (max_id is None or mention.id <= max_id)
+        ]
+        return page[:count]
+
+    def user_timeline(self, **kwargs):
+        self.call(const.TWITTER, "user_timeline")
+        return [SimpleNamespace(id=0)]
+
+    def get_status(self, id, **kwargs):
+        self.call(const.TWITTER, "get_status")
+        return SimpleNamespace(id=id, full_text="$AAA and $ABC are a buy")
+
+    def update_status(self, **kwargs):
+        self.call(const.TWITTER, "update_status")
+        with self.lock:
+            self.statuses.append(kwargs)
+
+    def media_upload(self, filename, file=None):
+        self.call(const.TWITTER, "media_upload")
+        return SimpleNamespace(media_id=next(self.media_ids))
+
+    # Alpha Vantage
+
+    def get_intraday(self, symbol):
+        self.call(const.ALPHA_VANTAGE, "get_intraday")
+        return {"2021-01-15 16:00:00": {"4. close": f"{price_of(symbol):.4f}"}}, {}
+
+    def get_quote_endpoint(self, symbol):
+        self.call(const.ALPHA_VANTAGE, "get_quote_endpoint")
+        return {"01. symbol": symbol, "05. price": f"{price_of(symbol):.4f}"}, {}
+
+    def get_daily_adjusted(self, symbol, outputsize="compact"):
+        self.call(const.ALPHA_VANTAGE, "get_daily_adjusted")
+        days = 100 if outputsize == "compact" else 5 * 365
+        return daily_adjusted(symbol, days), {}
+
+    def get_company_overview(self, symbol):
+        self.call(const.ALPHA_VANTAGE, "get_company_overview")
+        return company_overview(symbol), {}
+
+    def get_currency_exchange_rate(self, from_currency, to_currency):
+        self.call(const.ALPHA_VANTAGE, "get_currency_exchange_rate")
+        return {"5. Exchange Rate": f"{price_of(from_currency):.8f}"}, {}
+
+    def get_digital_crypto_rating(self, symbol):
+        self.call(const.ALPHA_VANTAGE, "get_digital_crypto_rating")
+        return {"1. symbol": symbol, "3. fcas rating": "Attractive"}, {}
+
+    # FMP and gif downloads
+
+    def http_get(self, url, **kwargs):
+        path = url.split("?")[0]
+        symbol = path.rsplit("/", 1)[-1]
+        if f"/{const.FMP_API_GET_PRICE_ENDPOINT}" in path:
+            self.call(const.FMP, "quote")
+            return Response([{"symbol": symbol, "price": price_of(symbol)}])
+        if f"/{const.FMP_API_RATING_ENDPOINT}" in path:
+            self.call(const.FMP, "rating")
+            return Response(rating(symbol))
+        self.call(const.GIPHY, "download")
+        return Response(content=GIF_BYTES)
+
+    # Giphy
+
+    def gifs_search_get(self, api_key, tag, limit=25, offset=0, fmt="json"):
+        self.call(const.GIPHY, "search")
+        gifs = [
+            SimpleNamespace(
+                images=SimpleNamespace(
+                    original=SimpleNamespace(
+                        url=f"https://media.giphy.com/{tag}/{index}.gif"
+                    )
+                )
+            )
+            for index in range(limit)
+        ]
+        return SimpleNamespace(data=gifs)
+
+    def install(self):
+        # Vendor quotas and budgets are lifted, the fakes only add latency
+        scheduler = vendors.RequestScheduler({})
+        stack = ExitStack()
+        for target, attribute, value in (
+            (bot, "init_tweepy", lambda: self),
+            (bot, "nasdaq_is_open", lambda: True),
+            (vendors, "alpha_vantage_client", lambda client_class: self),
+            (vendors, "giphy_api", lambda: self),
+            (vendors, "http_get", self.http_get),
+            (vendors, "scheduler", scheduler),
+            (vendors, "request", scheduler.request),
+        ):
+            stack.enter_context(patch.object(target, attribute, value))
+        stack.enter_context(patch.dict(const.VENDOR_DAILY_BUDGETS, clear=True))
+        return stack
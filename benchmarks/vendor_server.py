@@ -0,0 +1,377 @@
+import argparse
+import json
+import random
+import ssl
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.fakes import (
+    GIF_BYTES,
+    company_overview,
+    daily_adjusted,
+    mention_texts,
+    price_of,
+    rating,
+)
+from src import const
+from src.vendors import TokenBucket
+
+
+# Twitter limits are per endpoint, writes share the limit the bot already paces to
+RATE_LIMITS = {
+    const.ALPHA_VANTAGE: const.VENDOR_RATE_LIMITS[const.ALPHA_VANTAGE],
+    const.FMP: const.VENDOR_RATE_LIMITS[const.FMP],
+    const.GIPHY: [(42, 60 * 60)],
+    "twitter.mentions_timeline": [(75, 15 * 60)],
+    "twitter.user_timeline": [(900, 15 * 60)],
+    "twitter.get_status": [(900, 15 * 60)],
+    "twitter.update_status": const.VENDOR_RATE_LIMITS[const.TWITTER],
+}
+
+ALPHA_VANTAGE_LIMIT_NOTE = (
+    f"Thank you for using Alpha Vantage! {const.API_LIMIT_EXCEEDED_ERROR} "
+    "Please visit https://www.alphavantage.co/premium/ if you would like to target "
+    "a higher API call frequency."
+)
+
+FMP_LIMIT_MESSAGE = (
+    "Limit Reach . Please upgrade your plan or visit our documentation for more "
+    "details at https://financialmodelingprep.com/developer/docs/pricing "
+)
+
+TWITTER_DATE_FORMAT = "%a %b %d %H:%M:%S +0000 %Y"
+
+
+class VendorState:
+    def __init__(self, args):
+        self.latency = args.latency_ms / 1000
+        self.error_rate = args.error_rate
+        self.mentions = args.mentions
+        self.mentions_per_minute = args.mentions_per_minute
+        self.concentration = args.concentration
+        self.started_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.status_ids = iter(range(10**12, 10**13))
+        self.media_ids = iter(range(10**12, 10**13))
+        self.buckets = {
+            name: [TokenBucket(capacity, period) for capacity, period in limits]
+            for name, limits in ({} if args.unlimited else RATE_LIMITS).items()
+        }
+        self.rng = random.Random(args.seed)
+
+    def admit(self, vendor, endpoint):
+        # Returns whether the call is served, rate limited or fails at random
+        with self.lock:
+            self.calls[f"{vendor}.{endpoint}"] += 1
+            buckets = self.buckets.get(f"{vendor}.{endpoint}") or self.buckets.get(
+                vendor, []
+            )
+            if any(bucket.wait_time() > 0 for bucket in buckets):
+                self.rate_limited[f"{vendor}.{endpoint}"] += 1
+                return "rate_limited"
+            for bucket in buckets:
+                bucket.consume()
+            failed = self.rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        return "error" if failed else "ok"
+
+    def mention_count(self):
+        elapsed = time.monotonic() - self.started_at
+        return self.mentions + int(elapsed / 60 * self.mentions_per_minute)
+
+    def mention(self, mention_id):
+        text = mention_texts(1, self.concentration, random.Random(mention_id))[0]
+        return status(mention_id, text)
+
+    def next_id(self, ids):
+        with self.lock:
+            return next(ids)
+
+
+def status(status_id, text, in_reply_to_status_id=None):
+    return {
+        "id": status_id,
+        "id_str": str(status_id),
+        "text": text,
+        "full_text": text,
+        "created_at": datetime.utcnow().strftime(TWITTER_DATE_FORMAT),
+        "in_reply_to_status_id": in_reply_to_status_id,
+        "user": {"id": 1, "id_str": "1", "screen_name": "user_name"},
+        "entities": {},
+    }
+
+
+def intraday(symbol, interval):
+    now = datetime.now().replace(second=0, microsecond=0)
+    price = f"{price_of(symbol):.4f}"
+    return {
+        "Meta Data": {"2. Symbol": symbol, "4. Interval": interval},
+        f"Time Series ({interval})": {
+            (now - timedelta(minutes=15 * index)).strftime("%Y-%m-%d %H:%M:%S"): {
+                "1. open": price,
+                "2. high": price,
+                "3. low": price,
+                "4. close": price,
+                "5. volume": "100",
+            }
+            for index in range(4)
+        },
+    }
+
+
+def alpha_vantage_payload(query):
+    function = query.get("function")
+    symbol = query.get("symbol") or query.get("from_currency", "")
+    if function == "TIME_SERIES_INTRADAY":
+        return intraday(symbol, query.get("interval", "15min"))
+    if function == "GLOBAL_QUOTE":
+        return {
+            "Global Quote": {
+                "01. symbol": symbol,
+                "05. price": f"{price_of(symbol):.4f}",
+                "07. latest trading day": date.today().isoformat(),
+            }
+        }
+    if function == "TIME_SERIES_DAILY_ADJUSTED":
+        days = 5 * 365 if query.get("outputsize") == "full" else 100
+        return {
+            "Meta Data": {"2. Symbol": symbol},
+            "Time Series (Daily)": daily_adjusted(symbol, days),
+        }
+    if function == "OVERVIEW":
+        return company_overview(symbol)
+    if function == "CURRENCY_EXCHANGE_RATE":
+        return {
+            "Realtime Currency Exchange Rate": {
+                "1. From_Currency Code": symbol,
+                "3. To_Currency Code": query.get("to_currency"),
+                "5. Exchange Rate": f"{price_of(symbol):.8f}",
+            }
+        }
+    if function == "CRYPTO_RATING":
+        return {
+            "Crypto Rating (FCAS)": {
+                "1. symbol": symbol,
+                "3. fcas rating": "Attractive",
+                "4. fcas score": "850",
+            }
+        }
+    return {"Error Message": f"Invalid API call. Unknown function {function}."}
+
+
+class VendorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status_code=200):
+        self.send_body(json.dumps(payload).encode(), "application/json", status_code)
+
+    def send_body(self, body, content_type, status_code=200):
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.route("GET")
+
+    def do_POST(self):
+        # Uploads and status updates are accepted without looking at the body
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.route("POST")
+
+    def route(self, method):
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path
+        if path == "/stats":
+            return self.send_json(
+                {
+                    "calls": dict(sorted(self.state.calls.items())),
+                    "rate_limited": dict(sorted(self.state.rate_limited.items())),
+                }
+            )
+        if path == "/query":
+            return self.alpha_vantage(query)
+        if path.startswith("/api/v3/"):
+            return self.fmp(path.split("/api/v3/", 1)[1])
+        if path == "/v1/gifs/search":
+            return self.giphy_search(query)
+        if path.startswith("/media/"):
+            return self.send_body(GIF_BYTES, "image/gif")
+        if path.startswith("/1.1/"):
+            return self.twitter(method, path.split("/1.1/", 1)[1], query)
+        self.send_json({"error": f"No stand-in for {method} {path}"}, 404)
+
+    def alpha_vantage(self, query):
+        outcome = self.state.admit(const.ALPHA_VANTAGE, query.get("function", ""))
+        if outcome == "rate_limited":
+            # Alpha Vantage reports its limits with a 200 and a note
+            return self.send_json({"Note": ALPHA_VANTAGE_LIMIT_NOTE})
+        if outcome == "error":
+            return self.send_json({"error": "Service unavailable"}, 503)
+        self.send_json(alpha_vantage_payload(query))
+
+    def fmp(self, endpoint):
+        endpoint, _, symbol = endpoint.rpartition("/")
+        outcome = self.state.admit(const.FMP, endpoint)
+        if outcome == "rate_limited":
+            return self.send_json({"Error Message": FMP_LIMIT_MESSAGE}, 429)
+        if outcome == "error":
+            return self.send_json({"error": "Service unavailable"}, 503)
+        if f"{endpoint}/" == const.FMP_API_GET_PRICE_ENDPOINT:
+            return self.send_json([{"symbol": symbol, "price": price_of(symbol)}])
+        if f"{endpoint}/" == const.FMP_API_RATING_ENDPOINT:
+            return self.send_json(rating(symbol))
+        self.send_json({"Error Message": "Invalid endpoint"}, 404)
+
+    def giphy_search(self, query):
+        outcome = self.state.admit(const.GIPHY, "search")
+        if outcome == "rate_limited":
+            return self.send_json({"message": "API rate limit exceeded"}, 429)
+        if outcome == "error":
+            return self.send_json({"message": "Service unavailable"}, 503)
+        limit = int(query.get("limit", 25))
+        offset = int(query.get("offset", 0))
+        host = self.headers["Host"]
+        gifs = [
+            {
+                "type": "gif",
+                "id": f"{query.get('q')}-{index}",
+                "images": {
+                    "original": {"url": f"http://{host}/media/{offset + index}.gif"}
+                },
+            }
+            for index in range(limit)
+        ]
+        self.send_json(
+            {
+                "data": gifs,
+                "pagination": {"count": limit, "offset": offset},
+                "meta": {"status": 200, "msg": "OK"},
+            }
+        )
+
+    def twitter(self, method, path, query):
+        endpoint = {
+            ("GET", "statuses/mentions_timeline.json"): "mentions_timeline",
+            ("GET", "statuses/user_timeline.json"): "user_timeline",
+            ("GET", "statuses/show.json"): "get_status",
+            ("POST", "statuses/update.json"): "update_status",
+            ("POST", "media/upload.json"): "media_upload",
+        }.get((method, path))
+        if endpoint is None:
+            return self.send_json(
+                {
+                    "errors": [
+                        {"code": 34, "message": "Sorry, that page does not exist."}
+                    ]
+                },
+                404,
+            )
+        outcome = self.state.admit(const.TWITTER, endpoint)
+        if outcome == "rate_limited":
+            return self.send_json(
+                {"errors": [{"code": 88, "message": "Rate limit exceeded"}]}, 429
+            )
+        if outcome == "error":
+            return self.send_json(
+                {"errors": [{"code": 131, "message": "Internal error"}]}, 500
+            )
+        getattr(self, endpoint)(query)
+
+    def mentions_timeline(self, query):
+        since_id = int(query.get("since_id") or 0)
+        newest = self.state.mention_count()
+        if query.get("max_id"):
+            newest = min(newest, int(query["max_id"]))
+        count = int(query.get("count", 20))
+        oldest = max(since_id, newest - count)
+        self.send_json(
+            [self.state.mention(mention_id) for mention_id in range(newest, oldest, -1)]
+        )
+
+    def user_timeline(self, query):
+        self.send_json([status(0, "Latest reply from the bot")])
+
+    def get_status(self, query):
+        self.send_json(status(int(query["id"]), "$AAA and $ABC are a buy"))
+
+    def update_status(self, query):
+        reply_to = query.get("in_reply_to_status_id")
+        self.send_json(
+            status(
+                self.state.next_id(self.state.status_ids),
+                query.get("status", ""),
+                int(reply_to) if reply_to else None,
+            )
+        )
+
+    def media_upload(self, query):
+        media_id = self.state.next_id(self.state.media_ids)
+        self.send_json(
+            {
+                "media_id": media_id,
+                "media_id_string": str(media_id),
+                "expires_after_secs": 86400,
+            }
+        )
+
+
+def serve(args):
+    state = VendorState(args)
+    servers = [ThreadingHTTPServer((args.host, args.port), VendorHandler)]
+    if args.tls_port:
+        # tweepy only speaks https, point REQUESTS_CA_BUNDLE at the certificate
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(args.certfile, args.keyfile)
+        tls_server = ThreadingHTTPServer((args.host, args.tls_port), VendorHandler)
+        tls_server.socket = context.wrap_socket(tls_server.socket, server_side=True)
+        servers.append(tls_server)
+    for server in servers:
+        server.state = state
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Serving vendor stand-ins on {server.server_address}")
+    return servers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve local stand-ins for the vendor APIs the bot calls"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--tls-port", type=int)
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--unlimited", action="store_true", help="no rate limits")
+    parser.add_argument("--mentions", type=int, default=100)
+    parser.add_argument("--mentions-per-minute", type=float, default=10.0)
+    parser.add_argument("--concentration", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.tls_port and not (args.certfile and args.keyfile):
+        parser.error("--tls-port needs --certfile and --keyfile")
+
+    servers = serve(args)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
@@ -1,99 +1,197 @@
+import hashlib
+import json
 import logging
 import os
 import random
-import re
+import socket
+import threading
+import uuid
 
-import giphy_client
 import pytz
 
-import urllib.request
-
-import requests
 import tweepy
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
 from os import environ
 
 from alpha_vantage.cryptocurrencies import CryptoCurrencies
 from alpha_vantage.timeseries import TimeSeries
 from alpha_vantage.foreignexchange import ForeignExchange
 from alpha_vantage.fundamentaldata import FundamentalData
-from tweepy import TweepError
-
-from . import const
-from .models import Reminder
-from dateutil.parser import parse
-from datetime import date, datetime, time
+from tweepy import RateLimitError, TweepError
+
+from . import const, dates, metrics, report_image, returns, tokenizer, vendors
+from .cache import TTLCache
+from .models import (
+    CompanyOverview,
+    Cursor,
+    DailyPrice,
+    MentionFailure,
+    Outbox,
+    PooledMedia,
+    PriceHistory,
+    Reminder,
+    VendorCall,
+    compact_start,
+    db,
+)
+from datetime import date, datetime, time, timedelta
 import humanize
 
-import parsedatetime
-
 import pandas as pd
 import dataframe_image as dfi
 
 
 logger = logging.getLogger(__name__)
 
+quote_cache = TTLCache(max_size=const.QUOTE_CACHE_SIZE)
+report_cache = TTLCache(max_size=const.REPORT_CACHE_SIZE)
+metrics.watch_cache("quote", quote_cache)
+metrics.watch_cache("report", report_cache)
 
+
+@lru_cache(maxsize=None)
 def init_tweepy():
     auth = tweepy.OAuthHandler(environ["CONSUMER_KEY"], environ["CONSUMER_SECRET"])
     auth.set_access_token(environ["ACCESS_TOKEN"], environ["ACCESS_TOKEN_SECRET"])
-    return tweepy.API(auth)
+    return tweepy.API(
+        auth,
+        timeout=const.HTTP_TIMEOUT_SECONDS,
+        host=environ.get("TWITTER_API_HOST", const.TWITTER_API_HOST),
+        upload_host=environ.get("TWITTER_UPLOAD_HOST", const.TWITTER_UPLOAD_HOST),
+    )
 
 
 def reply_to_mentions():
     api = init_tweepy()
-    new_mentions = api.mentions_timeline(since_id=get_last_replied_tweet_id(api))
-    for mention in new_mentions:
-        tweet = mention.text
-        try:
-            if not is_valid(tweet) and not mention.in_reply_to_status_id:
-                reply_with_help_message(mention)
-                return
-            stocks = parse_stock_symbols(tweet)
-            if demands_report(tweet):
-                stock = stocks[0].replace("$", "")
-                reply_with_report(mention, stock)
-                return
-            if mention.in_reply_to_status_id:
-                reply_to_threaded_mention(mention)
-                return
-            remind_on = calculate_reminder_date(tweet)
-            for stock in stocks:
-                create_reminder(mention, stock.replace("$", ""))
-            reply_with_reminder_created_message(mention, remind_on)
-        except (KeyError, IndexError):
-            reply_with_stock_not_found_message(mention)
-
-
-def reply_to_threaded_mention(mention):
+    since_id = Cursor.get_position(const.MENTIONS_CURSOR)
+    if since_id is None:
+        since_id = get_last_replied_tweet_id(api)
+    mentions = fetch_mentions(api, since_id)
+    # Mentions finished while an earlier one deferred are fetched again, skip them
+    answered = Outbox.answered([mention.id for mention in mentions])
+    deferred = threading.Event()
+    workers = int(environ.get("MENTION_WORKERS", const.MENTION_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        processed = list(
+            executor.map(
+                lambda mention: mention.id in answered
+                or process_mention(mention, deferred),
+                mentions,
+            )
+        )
+    last_id = last_processed_mention_id(mentions, processed)
+    Cursor.advance(const.MENTIONS_CURSOR, since_id if last_id is None else last_id)
+
+
+@metrics.STAGE_SECONDS.labels("mention_fetch").time()
+def fetch_mentions(api, since_id):
+    # Pages go from newest to oldest until everything after since_id is fetched
+    mentions = {}
+    max_id = None
+    while True:
+        with vendors.recorded(const.TWITTER, "mentions_timeline"):
+            page = api.mentions_timeline(
+                since_id=since_id, max_id=max_id, count=const.MENTIONS_PAGE_SIZE
+            )
+        new_mentions = [mention for mention in page if mention.id not in mentions]
+        if not new_mentions:
+            break
+        mentions.update((mention.id, mention) for mention in new_mentions)
+        max_id = min(mention.id for mention in new_mentions) - 1
+    return sorted(mentions.values(), key=lambda mention: mention.id)
+
+
+def process_mention(mention, deferred):
+    # Once a vendor defers, later mentions are left for the next cycle as well
+    if deferred.is_set():
+        return False
+    try:
+        reply_to_mention(mention)
+    except vendors.RequestDeferred as error:
+        logger.info(f"Vendor quota exhausted, deferring mention: {mention.text}")
+        metrics.count_error("mention", error)
+        deferred.set()
+        return False
+    except Exception as error:
+        logger.exception(f"Failed to reply to mention {mention.id}")
+        metrics.count_error("mention", error)
+        if MentionFailure.record(mention.id) < const.MENTION_MAX_ATTEMPTS:
+            return False
+        reply_with_help_message(mention)
+    else:
+        metrics.MENTIONS_HANDLED.inc()
+    return True
+
+
+def last_processed_mention_id(mentions, processed):
+    # Highest id below which every mention has been processed
+    last_id = None
+    for mention, was_processed in zip(mentions, processed):
+        if not was_processed:
+            break
+        last_id = mention.id
+    return last_id
+
+
+def reply_to_mention(mention):
+    with metrics.timed("parse"):
+        intent = tokenizer.parse_mention(mention)
     try:
-        original_tweet = (
-            init_tweepy()
-            .get_status(mention.in_reply_to_status_id, tweet_mode="extended")
-            .full_text
+        if not tokenizer.is_valid(intent) and not intent.is_thread:
+            reply_with_help_message(mention)
+            return
+        if intent.demands_report:
+            reply_with_report(mention, tokenizer.stock_symbols(intent)[0])
+            return
+        if intent.is_thread:
+            reply_to_threaded_mention(mention, intent)
+            return
+        remind_on = calculate_reminder_date(mention.text)
+        create_reminders(
+            mention, tokenizer.stock_symbols(intent), intent.is_short, remind_on
         )
-        if not contains_stock(original_tweet) or not contains_date(mention.text):
+        reply_with_reminder_created_message(mention, remind_on, intent.cashtags)
+    except (KeyError, IndexError):
+        reply_with_stock_not_found_message(mention)
+
+
+def reply_to_threaded_mention(mention, intent):
+    try:
+        with vendors.recorded(const.TWITTER, "get_status"):
+            original_tweet = (
+                init_tweepy()
+                .get_status(mention.in_reply_to_status_id, tweet_mode="extended")
+                .full_text
+            )
+        original_intent = tokenizer.tokenize(original_tweet)
+        if not original_intent.cashtags or not intent.date_span:
             reply_with_help_message(mention)
             logger.info(f"Invalid threaded mention: {original_tweet}")
             return
-        stocks = parse_stock_symbols(original_tweet)
         remind_on = calculate_reminder_date(mention.text)
-        for stock in stocks:
-            create_reminder(mention, stock.replace("$", ""))
-        mention.text += " ".join(stocks)
-        reply_with_reminder_created_message(mention, remind_on)
+        create_reminders(
+            mention,
+            tokenizer.stock_symbols(original_intent),
+            intent.is_short,
+            remind_on,
+        )
+        reply_with_reminder_created_message(
+            mention, remind_on, intent.cashtags + original_intent.cashtags
+        )
     except TweepError:
         reply_with_help_message(mention)
         return
 
 
-def reply_with_reminder_created_message(mention, remind_on):
-    stocks = parse_stock_symbols(mention.text)
-    api = init_tweepy()
+def reply_with_reminder_created_message(mention, remind_on, cashtags):
+    stocks = list(cashtags)
     if len(stocks) > 1:
         stocks[-1] = "and " + stocks[-1]
         stocks[:-2] = [stock + "," for stock in stocks[:-2]]
 
-    api.update_status(
+    Outbox.enqueue(
         status=f"@{mention.user.screen_name} "
         f"{random.choice(const.CONFIRMATION_MESSAGES)} I'll remind you "
         f"of the price of {' '.join(stocks)} on "
@@ -105,65 +203,341 @@ def reply_with_reminder_created_message(mention, remind_on):
 
 def reply_with_help_message(mention):
     user = mention.user.screen_name
-    init_tweepy().update_status(
+    Outbox.enqueue(
         status=f"@{user} {const.HELP_MESSAGE}",
         in_reply_to_status_id=mention.id,
     )
 
 
 def reply_with_report(mention, stock):
-    generate_report(stock)
-    user = mention.user.screen_name
-    response = (
-        const.CRYPTO_REPORT_RESPONSE + stock + ":"
-        if stock in const.CRYPTO_CURRENCIES
-        else (const.REPORT_RESPONSE + stock + generate_rating(stock))
-    )
-
-    media = init_tweepy().media_upload(const.REPORT_FILE_NAME)
-    init_tweepy().update_status(
-        status=f"@{user} {response}",
+    try:
+        with vendors.priority(const.PRIORITY_REPORT):
+            response, media_id = get_report(stock)
+    except vendors.BudgetExceeded as error:
+        # Reports are the first work shed as the daily vendor budget runs out
+        logger.warning(str(error))
+        response, media_id = const.API_LIMIT_EXCEEDED_RESPONSE, None
+
+    Outbox.enqueue(
+        status=f"@{mention.user.screen_name} {response}",
         in_reply_to_status_id=mention.id,
-        media_ids=[media.media_id],
+        media_id=media_id,
     )
-    remove_file(const.REPORT_FILE_NAME)
+
+
+def get_report(stock):
+    data = generate_report(stock)
+    key = (stock, trading_day(), fields_digest(data))
+    report = report_cache.get(key)
+    if report is None:
+        response = (
+            const.CRYPTO_REPORT_RESPONSE + stock + ":"
+            if stock in const.CRYPTO_CURRENCIES
+            else (const.REPORT_RESPONSE + stock + generate_rating(stock))
+        )
+        image = save_report_to_image(data)
+        media_id = upload_media(init_tweepy(), const.REPORT_FILE_NAME, image)
+        report = (response, media_id)
+        report_cache.set(key, report, report_ttl())
+    return report
+
+
+def trading_day():
+    return datetime.now(pytz.timezone("US/Eastern")).date()
+
+
+def report_ttl():
+    # Reports are rebuilt every trading day and media ids expire after a day
+    nyc = pytz.timezone("US/Eastern")
+    nyc_now = datetime.now(nyc)
+    midnight = nyc.localize(datetime.combine(nyc_now.date() + timedelta(1), time()))
+    until_midnight = (midnight - nyc_now).total_seconds()
+    return min(until_midnight, const.MEDIA_ID_TTL_HOURS * 3600)
+
+
+def fields_digest(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
 
 
 def reply_with_stock_not_found_message(mention):
     logger.info(f"Stock not found in mention: {mention.text}")
-    init_tweepy().update_status(
+    Outbox.enqueue(
         status=f"@{mention.user.screen_name} {const.STOCK_NOT_FOUND_RESPONSE}",
         in_reply_to_status_id=mention.id,
     )
 
 
 def publish_reminders():
-    for reminder in Reminder.due_now():
-        api = init_tweepy()
-        status = generate_investment_results(reminder)
-        if const.POSITIVE_RETURNS_EMOJI in status:
-            download_random_gif(const.POSITIVE_RETURN_TAGS)
-        if const.ZERO_RETURNS_EMOJI in status:
-            download_random_gif(const.ZERO_RETURN_TAGS)
-        if const.NEGATIVE_RETURNS_EMOJI in status:
-            gif_url = random.choice(const.NEGATIVE_RETURN_GIFS)
-            download_pre_selected_gif(gif_url)
-        media = api.media_upload(const.GIF_FILE_NAME)
-        api.update_status(
-            status=status,
-            media_ids=[media.media_id],
-            in_reply_to_status_id=reminder.tweet_id,
+    tokens = []
+    try:
+        while True:
+            tokens.append(claim_token())
+            batch = Reminder.claim_due(tokens[-1])
+            if not batch:
+                break
+            publish_batch(batch, tokens[-1])
+    finally:
+        # Deferred reminders go back to the queue for the next cycle
+        Reminder.release(tokens)
+
+
+def claim_token():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex}"
+
+
+def publish_batch(batch, token):
+    api = init_tweepy()
+    renew_at = datetime.now() + timedelta(minutes=const.CLAIM_LEASE_MINUTES / 2)
+    for stock, reminders in group_by_stock(batch).items():
+        messages = []
+        try:
+            with vendors.priority(const.PRIORITY_PUBLISH):
+                results = generate_investment_results_for_stock(stock, reminders)
+        except vendors.RequestDeferred as error:
+            logger.info(f"Vendor quota exhausted, deferring reminders for ${stock}")
+            metrics.count_error("publish", error)
+        except (KeyError, IndexError, ValueError) as error:
+            logger.exception(f"Could not fetch market data for ${stock}")
+            metrics.count_error("publish", error)
+            for reminder in reminders:
+                reminder.retry_later()
+                if reminder.attempts >= const.REMINDER_MAX_ATTEMPTS:
+                    messages.append(price_unavailable_message(reminder))
+        else:
+            for reminder, status in results:
+                messages.append(reminder_message(api, reminder, status))
+        finally:
+            # Each stock is queued as soon as it is done, whatever was queued is
+            # marked finished even if the batch fails midway
+            queue_reminder_messages(messages, token)
+        # Vendor calls are paced, so a large batch could outlive a single lease
+        if datetime.now() >= renew_at:
+            Reminder.renew(token)
+            renew_at = datetime.now() + timedelta(minutes=const.CLAIM_LEASE_MINUTES / 2)
+
+
+def queue_reminder_messages(messages, token):
+    with db.atomic():
+        finished = set(
+            Reminder.finish_many([message["reminder"] for message in messages], token)
+        )
+        Outbox.enqueue_many(
+            [message for message in messages if message["reminder"] in finished]
+        )
+
+
+def reminder_message(api, reminder, status):
+    sentiment = status_sentiment(status)
+    # Fall back to uploading a gif inline until the pool has been filled
+    media_id = PooledMedia.pick(sentiment) or upload_gif(api, sentiment)
+    return {
+        "status": status,
+        "in_reply_to_status_id": reminder.tweet_id,
+        "media_id": media_id,
+        "reminder": reminder.id,
+    }
+
+
+def price_unavailable_message(reminder):
+    logger.error(f"Giving up on reminder {reminder.id} for ${reminder.stock_symbol}")
+    return {
+        "status": f"@{reminder.user_name} {const.PRICE_UNAVAILABLE_RESPONSE}"
+        f"{reminder.stock_symbol} 😓",
+        "in_reply_to_status_id": reminder.tweet_id,
+        "media_id": None,
+        "reminder": reminder.id,
+    }
+
+
+def send_outbox():
+    token = claim_token()
+    try:
+        with vendors.priority(const.PRIORITY_PUBLISH):
+            send_messages(Outbox.claim_pending(token))
+    finally:
+        Outbox.release([token])
+
+
+def send_messages(messages):
+    api = init_tweepy()
+    for message in messages:
+        try:
+            vendors.scheduler.acquire(const.TWITTER, const.PRIORITY_PUBLISH)
+            with metrics.timed("update_status"), vendors.recorded(
+                const.TWITTER, "update_status"
+            ):
+                api.update_status(**message.update_status_kwargs())
+        except vendors.RequestDeferred:
+            logger.info("Twitter write limit reached, leaving outbox for later")
+            return
+        except RateLimitError as error:
+            metrics.count_error("update_status", error)
+            message.retry_later(error)
+            vendors.scheduler.exhaust(const.TWITTER)
+            return
+        except TweepError as error:
+            metrics.count_error("update_status", error)
+            if is_transient(error):
+                message.retry_later(error)
+            else:
+                logger.error(f"Dropping outbox message {message.id}: {error}")
+                message.fail(error)
+        else:
+            message.mark_sent()
+            if message.reminder_id is not None:
+                metrics.REMINDERS_PUBLISHED.inc()
+                metrics.REMINDER_LAG_SECONDS.set(
+                    (datetime.now() - message.reminder.remind_on).total_seconds()
+                )
+
+
+def is_transient(error):
+    # Timeouts and connection errors come without a response
+    return error.response is None or error.response.status_code >= 500
+
+
+def status_sentiment(status):
+    for sentiment, emoji in const.SENTIMENT_EMOJIS.items():
+        if emoji in status:
+            return sentiment
+
+
+def upload_gif(api, sentiment):
+    if sentiment == const.NEGATIVE_SENTIMENT:
+        gif = download_pre_selected_gif(random.choice(const.NEGATIVE_RETURN_GIFS))
+    else:
+        gif = download_random_gif(const.SENTIMENT_TAGS[sentiment])
+    return upload_media(api, const.GIF_FILE_NAME, gif)
+
+
+@metrics.STAGE_SECONDS.labels("media_upload").time()
+def upload_media(api, filename, file):
+    with vendors.recorded(const.TWITTER, "media_upload"):
+        return api.media_upload(filename, file=file).media_id
+
+
+def refresh_media_pool():
+    api = init_tweepy()
+    PooledMedia.purge_expired()
+    for sentiment in const.SENTIMENT_EMOJIS:
+        missing = const.MEDIA_POOL_SIZE - PooledMedia.valid(sentiment).count()
+        for _ in range(missing):
+            try:
+                PooledMedia.add(sentiment, upload_gif(api, sentiment))
+            except Exception:
+                logger.exception(f"Could not refill {sentiment} media pool")
+                break
+
+
+def log_vendor_usage():
+    yesterday = date.today() - timedelta(days=1)
+    for usage in VendorCall.daily_usage(yesterday):
+        logger.info(
+            f"{yesterday}: {usage['calls']} {usage['vendor']} {usage['endpoint']} "
+            f"calls for {usage['purpose']} ({usage['status']}), "
+            f"{usage['average_latency']:.2f}s on average"
         )
-        reminder.finish()
-        remove_file(const.GIF_FILE_NAME)
+    VendorCall.purge_before(
+        date.today() - timedelta(days=const.VENDOR_CALL_RETENTION_DAYS)
+    )
+
+
+def prefetch_market_data():
+    upcoming = group_by_stock(Reminder.due_within(const.PREFETCH_LOOKAHEAD_MINUTES))
+    if not upcoming:
+        return
+    with vendors.priority(const.PRIORITY_PREFETCH):
+        for stock, reminders in upcoming.items():
+            try:
+                # Only the live price is left to fetch when the reminders are due
+                get_split_factors(stock, reminders)
+                get_dividends(stock, reminders)
+            except vendors.RequestDeferred:
+                logger.info("No spare vendor quota, stopping prefetch")
+                break
+            except (KeyError, IndexError, ValueError):
+                logger.exception(f"Could not prefetch market data for ${stock}")
+
+
+def group_by_stock(reminders):
+    reminders_by_stock = {}
+    for reminder in reminders:
+        reminders_by_stock.setdefault(reminder.stock_symbol, []).append(reminder)
+    return reminders_by_stock
+
+
+def generate_investment_results_for_stock(stock, reminders):
+    # Market data is resolved once per stock and shared by all of its reminders
+    current_price = get_price(stock)
+    split_factors = get_split_factors(stock, reminders)
+    dividends = get_dividends(stock, reminders)
+    return generate_investment_results_batch(
+        reminders,
+        [current_price] * len(reminders),
+        [split_factors[reminder.created_on] for reminder in reminders],
+        [dividends[dividend_window(reminder)] for reminder in reminders],
+    )
+
+
+def generate_investment_results_batch(
+    reminders, current_prices, split_factors, dividends
+):
+    adjusted_prices, rates, sentiments = returns.investment_returns(
+        [reminder.stock_price for reminder in reminders],
+        split_factors,
+        dividends,
+        current_prices,
+        [reminder.short for reminder in reminders],
+    )
+    today = date.today()
+    statuses = map(
+        investment_status,
+        [today] * len(reminders),
+        reminders,
+        current_prices,
+        split_factors,
+        dividends,
+        adjusted_prices,
+        rates,
+        [const.SENTIMENT_EMOJIS[sentiment] for sentiment in sentiments],
+    )
+    return list(zip(reminders, statuses))
 
 
-def generate_investment_results(reminder):
-    split_factor = get_split_factor(reminder)
-    dividend = get_dividend(reminder)
+def generate_investment_results(reminder, current_price, split_factor, dividend):
     original_adjusted_price = reminder.stock_price / split_factor
-    current_price = get_price(reminder.stock_symbol)
     rate_of_return = calculate_returns(original_adjusted_price, current_price, dividend)
+    if reminder.short:
+        rate_of_return *= -1
+
+    emoji = const.POSITIVE_RETURNS_EMOJI
+    if rate_of_return == 0:
+        emoji = const.ZERO_RETURNS_EMOJI
+    if rate_of_return < 0:
+        emoji = const.NEGATIVE_RETURNS_EMOJI
+
+    return investment_status(
+        date.today(),
+        reminder,
+        current_price,
+        split_factor,
+        dividend,
+        original_adjusted_price,
+        rate_of_return,
+        emoji,
+    )
+
+
+def investment_status(
+    today,
+    reminder,
+    current_price,
+    split_factor,
+    dividend,
+    original_adjusted_price,
+    rate_of_return,
+    emoji,
+):
     stock_split_message = "."
     dividend_message = ""
     if split_factor != 1.0:
@@ -175,18 +549,8 @@ def generate_investment_results(reminder):
         dividend_message = (
             f" and a total dividend of ${'{:.2f}'.format(dividend)} was paid out"
         )
-    time_since_created_on = calculate_time_delta(date.today(), reminder.created_on)
-    user_action = "bought"
-    if reminder.short:
-        rate_of_return *= -1
-        user_action = "shorted"
-
-    emoji = const.POSITIVE_RETURNS_EMOJI
-    if rate_of_return == 0:
-        emoji = const.ZERO_RETURNS_EMOJI
-    if rate_of_return < 0:
-        emoji = const.NEGATIVE_RETURNS_EMOJI
-
+    time_since_created_on = calculate_time_delta(today, reminder.created_on)
+    user_action = "shorted" if reminder.short else "bought"
     return (
         f"@{reminder.user_name} {time_since_created_on} ago you {user_action} "
         f"${reminder.stock_symbol} at ${'{:,.2f}'.format(reminder.stock_price)}"
@@ -195,71 +559,64 @@ def generate_investment_results(reminder):
     )
 
 
-def create_reminder(mention, stock):
-    price = get_price(stock)
-    values = {
+def create_reminders(mention, stocks, is_short, remind_on):
+    Reminder.create_many(
+        [reminder_values(mention, stock, is_short, remind_on) for stock in stocks]
+    )
+
+
+def reminder_values(mention, stock, is_short, remind_on):
+    return {
         "user_name": mention.user.screen_name,
         "tweet_id": mention.id,
         "created_on": date.today(),
-        "remind_on": calculate_reminder_date(mention.text),
+        "remind_on": remind_on,
         "stock_symbol": stock,
-        "stock_price": price,
-        "short": "short" in mention.text.lower(),
+        "stock_price": get_price(stock),
+        "short": is_short,
     }
-    return Reminder.create_instance(values)
 
 
 def get_last_replied_tweet_id(client):
     return client.user_timeline(id=environ["BOT_USER_ID"], count=1)[0].id
 
 
-def is_valid(tweet):
-    return demands_report(tweet) or contains_stock(tweet) and contains_date(tweet)
-
-
-def contains_stock(tweet):
-    return const.CASHTAG in tweet
-
-
-def contains_date(tweet):
-    if any([string in tweet for string in const.DATE_TIME_STRINGS]):
-        return True
-    try:
-        parse(tweet, fuzzy=True)
-        return True
-    except ValueError:
-        return False
-
-
-def parse_stock_symbols(tweet):
-    return re.findall(r"[$][A-Za-z]+", tweet)
-
-
-def demands_report(tweet):
-    return any(
-        keyword in tweet.lower() for keyword in const.REPORT_KEYWORDS
-    ) and contains_stock(tweet)
-
-
 def generate_report(stock):
     logger.info(f"Generating report for {stock}")
     if stock.replace("$", "") in const.CRYPTO_CURRENCIES:
-        crypto = CryptoCurrencies(key=environ["ALPHA_VANTAGE_API_KEY"])
-        data, _ = crypto.get_digital_crypto_rating(stock)
-    else:
-        fd = FundamentalData(key=environ["ALPHA_VANTAGE_API_KEY"])
-        data, _ = fd.get_company_overview(stock)
-        for (key, val) in list(data.items()):
-            if val.isnumeric():
-                data[key] = "${:,.2f}".format(float(val))
-            if key not in const.REPORT_FIELDS:
-                data.pop(key)
-    save_report_to_image(data)
+        return get_crypto_rating(stock)
+    # The overview may be shared with concurrent split lookups, so it is not mutated
+    return {
+        key: "${:,.2f}".format(float(val)) if val.isnumeric() else val
+        for key, val in get_company_overview(stock).items()
+        if key in const.REPORT_FIELDS
+    }
+
+
+def get_crypto_rating(stock):
+    # Ratings are refreshed daily, keep them next to the rendered reports
+    key = (stock, trading_day())
+    data = report_cache.get(key)
+    if data is None:
+        crypto = vendors.alpha_vantage_client(CryptoCurrencies)
+        data, _ = vendors.request(
+            const.ALPHA_VANTAGE,
+            "get_digital_crypto_rating",
+            crypto.get_digital_crypto_rating,
+            stock,
+            stock=stock,
+        )
+        report_cache.set(key, data, report_ttl())
+    return data
 
 
 def generate_rating(stock):
-    rating_response = requests.get(
-        f'{const.FMP_API_RATING_ENDPOINT}{stock}?apikey={environ["FMP_API_KEY"]}'
+    rating_response = vendors.request(
+        const.FMP,
+        "rating",
+        vendors.http_get,
+        vendors.fmp_url(const.FMP_API_RATING_ENDPOINT, stock),
+        stock=stock,
     )
     rating_data = rating_response.json()
 
@@ -274,43 +631,89 @@ def generate_rating(stock):
     return ". " + ", ".join(ratings_list) + ". Details: "
 
 
+@metrics.STAGE_SECONDS.labels("report_render").time()
 def save_report_to_image(data):
+    renderer = environ.get("REPORT_RENDERER", const.PILLOW_RENDERER)
+    if renderer == const.PILLOW_RENDERER:
+        return report_image.render_table(data)
     df = pd.DataFrame(data, index=[""]).T
-    dfi.export(df, const.REPORT_FILE_NAME, table_conversion=None, fontsize=12)
+    image = BytesIO()
+    dfi.export(df, image, table_conversion=None, fontsize=12)
+    image.seek(0)
+    return image
 
 
 def calculate_reminder_date(tweet):
-    cal = parsedatetime.Calendar(version=parsedatetime.VERSION_CONTEXT_STYLE)
-    result, _ = cal.parseDT(tweet, tzinfo=pytz.utc, sourceTime=datetime.now())
-    return result
+    return dates.resolve(tweet, datetime.now())
 
 
+@lru_cache(maxsize=1024)
 def calculate_time_delta(today, created_on):
     return humanize.naturaldelta(today - created_on)
 
 
 def get_price(stock):
+    price = quote_cache.get(stock)
+    if price is None:
+        price = fetch_price(stock)
+        quote_cache.set(stock, price, quote_ttl(stock))
+    return price
+
+
+def quote_ttl(stock):
+    if stock in const.CRYPTO_CURRENCIES:
+        return const.CRYPTO_QUOTE_TTL_SECONDS
+    if nasdaq_is_open():
+        return const.OPEN_MARKET_QUOTE_TTL_SECONDS
+    # Closing prices don't change until the market opens again
+    nyc_now = datetime.now(pytz.timezone("US/Eastern"))
+    return (next_nasdaq_open(nyc_now) - nyc_now).total_seconds()
+
+
+def fetch_price(stock):
     if stock in const.CRYPTO_CURRENCIES:
-        fe = ForeignExchange(key=environ["ALPHA_VANTAGE_API_KEY"])
-        data, _ = fe.get_currency_exchange_rate(stock, "USD")
+        fe = vendors.alpha_vantage_client(ForeignExchange)
+        data, _ = vendors.request(
+            const.ALPHA_VANTAGE,
+            "get_currency_exchange_rate",
+            fe.get_currency_exchange_rate,
+            stock,
+            "USD",
+            stock=stock,
+        )
         full_price = data["5. Exchange Rate"]
         return float(full_price[:-2])
     else:
         try:
-            ts = TimeSeries(key=environ["ALPHA_VANTAGE_API_KEY"])
+            ts = vendors.alpha_vantage_client(TimeSeries)
             if nasdaq_is_open():
-                data, meta_data = ts.get_intraday(stock)
+                data, meta_data = vendors.request(
+                    const.ALPHA_VANTAGE,
+                    "get_intraday",
+                    ts.get_intraday,
+                    stock,
+                    stock=stock,
+                )
                 key = list(data.keys())[0]
                 full_price = data[key]["4. close"]
                 return float(full_price[:-2])
             else:
-                data, _ = ts.get_quote_endpoint(stock)
+                data, _ = vendors.request(
+                    const.ALPHA_VANTAGE,
+                    "get_quote_endpoint",
+                    ts.get_quote_endpoint,
+                    stock,
+                    stock=stock,
+                )
                 full_price = data["05. price"]
                 return float(full_price[:-2])
-        except ValueError:
-            response = requests.get(
-                f"{const.FMP_API_GET_PRICE_ENDPOINT}"
-                f'{stock}?apikey={environ["FMP_API_KEY"]}'
+        except (ValueError, vendors.RequestDeferred):
+            response = vendors.request(
+                const.FMP,
+                "quote",
+                vendors.http_get,
+                vendors.fmp_url(const.FMP_API_GET_PRICE_ENDPOINT, stock),
+                stock=stock,
             )
             return response.json()[0]["price"]
 
@@ -325,42 +728,103 @@ def nasdaq_is_open():
     return closing_time >= nyc_time >= open_time
 
 
-def get_split_factor(reminder):
-    if reminder.stock_symbol in const.CRYPTO_CURRENCIES:
-        return 1.0
+def next_nasdaq_open(nyc_now):
+    open_time = time(hour=9, minute=30)
+    open_date = nyc_now.date()
+    if nyc_now.time() >= open_time:
+        open_date += timedelta(days=1)
+    while open_date.weekday() in const.WEEKEND_DAYS:
+        open_date += timedelta(days=1)
+    return pytz.timezone("US/Eastern").localize(datetime.combine(open_date, open_time))
+
+
+def get_company_overview(stock):
+    data = CompanyOverview.get_fresh(stock)
+    if data is None:
+        fd = vendors.alpha_vantage_client(FundamentalData)
+        data, _ = vendors.request(
+            const.ALPHA_VANTAGE,
+            "get_company_overview",
+            fd.get_company_overview,
+            stock,
+            stock=stock,
+        )
+        if data:
+            CompanyOverview.store(stock, data)
+    return data
+
+
+def get_split_factors(stock, reminders):
+    if stock in const.CRYPTO_CURRENCIES:
+        return {reminder.created_on: 1.0 for reminder in reminders}
+
+    data = get_company_overview(stock)
+    return {
+        reminder.created_on: calculate_split_factor(data, reminder.created_on)
+        for reminder in reminders
+    }
 
-    fd = FundamentalData(key=environ["ALPHA_VANTAGE_API_KEY"])
-    data, _ = fd.get_company_overview(reminder.stock_symbol)
 
+def calculate_split_factor(data, created_on):
     last_split_date = data.get("LastSplitDate")
     if last_split_date in [None, "None"]:
         return 1.0
     split_date = datetime.strptime(data["LastSplitDate"], "%Y-%m-%d").date()
-    stock_was_split = reminder.created_on < split_date <= date.today()
+    stock_was_split = created_on < split_date <= date.today()
     if stock_was_split:
         return float(data["LastSplitFactor"][0]) / float(data["LastSplitFactor"][2])
     return 1.0
 
 
-def get_dividend(reminder):
-    if reminder.stock_symbol in const.CRYPTO_CURRENCIES:
-        return 0.0
+def dividend_window(reminder):
+    return reminder.created_on, reminder.remind_on.date()
 
-    delta = reminder.remind_on.date() - reminder.created_on
-    if delta.days > 90:
-        outputsize = "full"
-    else:
-        outputsize = "compact"
-    ts = TimeSeries(key=environ["ALPHA_VANTAGE_API_KEY"])
-    data, _ = ts.get_daily_adjusted(reminder.stock_symbol, outputsize=outputsize)
-    keys = list(data.keys())
-    dividend = 0.0
-    for key in keys:
-        dividend_date = datetime.strptime(key, "%Y-%m-%d").date()
-        if reminder.created_on < dividend_date <= reminder.remind_on.date():
-            dividend += float(data[key]["7. dividend amount"])
 
-    return dividend
+def get_dividends(stock, reminders):
+    windows = {dividend_window(reminder) for reminder in reminders}
+    if stock in const.CRYPTO_CURRENCIES:
+        return {window: 0.0 for window in windows}
+
+    sync_price_history(stock, since=min(start for start, _ in windows))
+    return {
+        (start, end): DailyPrice.dividend_between(stock, start, end)
+        for start, end in windows
+    }
+
+
+def sync_price_history(stock, since):
+    history = PriceHistory.get_or_none(PriceHistory.stock_symbol == stock)
+    if history and history.covers(since) and not history.is_stale():
+        return
+
+    # The full series is only downloaded once, afterwards compact top-ups suffice
+    if history is None:
+        needs_full = since < compact_start()
+    else:
+        last_day = DailyPrice.last_day(stock)
+        needs_full = not history.covers(since) or (
+            last_day is not None and last_day < compact_start()
+        )
+    outputsize = "full" if needs_full else "compact"
+
+    ts = vendors.alpha_vantage_client(TimeSeries)
+    data, _ = vendors.request(
+        const.ALPHA_VANTAGE,
+        "get_daily_adjusted",
+        ts.get_daily_adjusted,
+        stock,
+        outputsize=outputsize,
+        stock=stock,
+    )
+    prices = [
+        (
+            datetime.strptime(key, "%Y-%m-%d").date(),
+            float(val["4. close"]),
+            float(val["7. dividend amount"]),
+        )
+        for key, val in data.items()
+    ]
+    DailyPrice.store_history(stock, prices, is_full=needs_full)
 
 
 def calculate_returns(original_price, current_price, dividend):
@@ -370,21 +834,29 @@ def calculate_returns(original_price, current_price, dividend):
 
 
 def download_random_gif(tags):
-    giphy_api = giphy_client.DefaultApi()
-    open(const.GIF_FILE_NAME, "w")
+    giphy_api = vendors.giphy_api()
     gif_url = (
-        giphy_api.gifs_search_get(
-            environ["GIPHY_API_KEY"], random.choice(tags), limit=3, offset=3, fmt="json"
+        vendors.request(
+            const.GIPHY,
+            "search",
+            giphy_api.gifs_search_get,
+            environ["GIPHY_API_KEY"],
+            random.choice(tags),
+            limit=3,
+            offset=3,
+            fmt="json",
         )
         .data[random.choice(range(3))]
         .images.original.url
     )
-    urllib.request.urlretrieve(gif_url, const.GIF_FILE_NAME)
+    return fetch_gif(gif_url)
 
 
 def download_pre_selected_gif(url):
-    urllib.request.urlretrieve(url, const.GIF_FILE_NAME)
+    return fetch_gif(url)
 
 
-def remove_file(file):
-    os.remove(file) if os.path.exists(file) else None
+def fetch_gif(url):
+    response = vendors.http_get(url)
+    response.raise_for_status()
+    return BytesIO(response.content)
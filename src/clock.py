@@ -1,22 +1,91 @@
+import logging
+import time
+from datetime import datetime
+from functools import wraps
 from os import environ
 
 import sentry_sdk
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.blocking import BlockingScheduler
 
-from . import bot, models
+from . import bot, const, metrics, models
+
+logger = logging.getLogger(__name__)
 
 sentry_sdk.init(environ["SENTRY_PROJECT_URL"], traces_sample_rate=1.0)
-sched = BlockingScheduler()
+sched = BlockingScheduler(
+    executors={"default": ThreadPoolExecutor(const.SCHEDULER_WORKERS)},
+    job_defaults={
+        "max_instances": 1,
+        "coalesce": True,
+        "misfire_grace_time": const.JOB_MISFIRE_GRACE_SECONDS,
+    },
+)
+
+
+def tracked(interval):
+    def decorator(func):
+        @wraps(func)
+        def wrapper():
+            started_at = time.monotonic()
+            try:
+                return func()
+            finally:
+                duration = time.monotonic() - started_at
+                metrics.JOB_SECONDS.labels(func.__name__).observe(duration)
+                if duration > interval:
+                    logger.warning(
+                        f"{func.__name__} took {duration:.1f}s, "
+                        f"longer than its {interval}s interval"
+                    )
+                else:
+                    logger.info(f"{func.__name__} took {duration:.1f}s")
+
+        return wrapper
 
+    return decorator
 
-@sched.scheduled_job("interval", minutes=2)
-def timed_job():
+
+@sched.scheduled_job("interval", seconds=const.MENTIONS_JOB_INTERVAL_SECONDS)
+@tracked(const.MENTIONS_JOB_INTERVAL_SECONDS)
+def mentions_job():
     bot.reply_to_mentions()
+
+
+@sched.scheduled_job("interval", seconds=const.REMINDERS_JOB_INTERVAL_SECONDS)
+@tracked(const.REMINDERS_JOB_INTERVAL_SECONDS)
+def reminders_job():
     bot.publish_reminders()
 
 
+@sched.scheduled_job("interval", seconds=const.OUTBOX_JOB_INTERVAL_SECONDS)
+@tracked(const.OUTBOX_JOB_INTERVAL_SECONDS)
+def outbox_job():
+    bot.send_outbox()
+
+
+@sched.scheduled_job("interval", minutes=const.PREFETCH_JOB_INTERVAL_MINUTES)
+@tracked(const.PREFETCH_JOB_INTERVAL_MINUTES * 60)
+def prefetch_job():
+    bot.prefetch_market_data()
+
+
+@sched.scheduled_job(
+    "interval", minutes=const.MEDIA_POOL_REFRESH_MINUTES, next_run_time=datetime.now()
+)
+@tracked(const.MEDIA_POOL_REFRESH_MINUTES * 60)
+def media_pool_job():
+    bot.refresh_media_pool()
+
+
+@sched.scheduled_job("cron", hour=0, minute=5)
+def vendor_usage_job():
+    bot.log_vendor_usage()
+
+
 def main():
     models.migrate()
+    metrics.serve()
     sched.start()
 
 
@@ -24,6 +24,25 @@ NASDAQ_TRADING_HOURS = ["09:30:00", "16:00:00"]
 
 WEEKEND_DAYS = [5, 6]
 
+QUOTE_CACHE_SIZE = 512
+
+OPEN_MARKET_QUOTE_TTL_SECONDS = 60
+
+CRYPTO_QUOTE_TTL_SECONDS = 60
+
+OVERVIEW_SPLIT_WINDOW_DAYS = 7
+
+OVERVIEW_SPLIT_REFRESH_MINUTES = 60
+
+PRICE_HISTORY_REFRESH_MINUTES = 60
+
+# Roughly the calendar days covered by a "compact" daily series (100 trading days)
+COMPACT_HISTORY_DAYS = 90
+
+DIVIDEND_PRECISION = 4
+
+INSERT_BATCH_SIZE = 500
+
 POSITIVE_RETURNS_EMOJI = "🚀🤑📈"
 
 NEGATIVE_RETURNS_EMOJI = "😭📉"
@@ -36,6 +55,58 @@ POSITIVE_RETURN_TAGS = ["money", "rich", "cash", "dollars"]
 
 ZERO_RETURN_TAGS = ["shrug", "math"]
 
+POSITIVE_SENTIMENT = "positive"
+
+ZERO_SENTIMENT = "zero"
+
+NEGATIVE_SENTIMENT = "negative"
+
+SENTIMENT_EMOJIS = {
+    POSITIVE_SENTIMENT: POSITIVE_RETURNS_EMOJI,
+    ZERO_SENTIMENT: ZERO_RETURNS_EMOJI,
+    NEGATIVE_SENTIMENT: NEGATIVE_RETURNS_EMOJI,
+}
+
+SENTIMENT_TAGS = {
+    POSITIVE_SENTIMENT: POSITIVE_RETURN_TAGS,
+    ZERO_SENTIMENT: ZERO_RETURN_TAGS,
+}
+
+MEDIA_POOL_SIZE = 5
+
+MEDIA_POOL_REFRESH_MINUTES = 30
+
+MENTIONS_JOB_INTERVAL_SECONDS = 120
+
+REMINDERS_JOB_INTERVAL_SECONDS = 60
+
+# Late runs are skipped rather than piled up, the next run picks up the work
+JOB_MISFIRE_GRACE_SECONDS = 30
+
+SCHEDULER_WORKERS = 4
+
+METRICS_PORT = 8000
+
+OUTBOX_JOB_INTERVAL_SECONDS = 15
+
+OUTBOX_BATCH_SIZE = 50
+
+OUTBOX_MAX_ATTEMPTS = 5
+
+OUTBOX_RETRY_BASE_SECONDS = 30
+
+OUTBOX_RETRY_MAX_SECONDS = 30 * 60
+
+# Reminders whose market data keeps failing are given up on after a few cycles
+REMINDER_MAX_ATTEMPTS = 5
+
+REMINDER_RETRY_BASE_SECONDS = 60
+
+REMINDER_RETRY_MAX_SECONDS = 60 * 60
+
+# Uploaded media can be attached to tweets for 24 hours
+MEDIA_ID_TTL_HOURS = 23
+
 NEGATIVE_RETURN_GIFS = [
     "https://media.giphy.com/media/3orieUs03VUeeBa7Wo/giphy.gif",
     "https://media.giphy.com/media/l2JdWPIgVK83qxB4Y/giphy.gif",
@@ -46,6 +117,40 @@ NEGATIVE_RETURN_GIFS = [
     "https://media.giphy.com/media/xThtatVgZVprKd3UEU/giphy.gif",
 ]
 
+MENTION_WORKERS = 4
+
+REMINDER_LOOKAHEAD_MINUTES = 3
+
+DUE_BATCH_SIZE = 500
+
+# How long a worker may hold claimed reminders or outbox messages
+CLAIM_LEASE_MINUTES = 15
+
+MENTIONS_CURSOR = "mentions"
+
+MENTIONS_PAGE_SIZE = 200
+
+# Mentions failing unexpectedly hold the cursor back for a few cycles before the
+# help message is sent instead
+MENTION_MAX_ATTEMPTS = 3
+
+DATE_PHRASE_CACHE_SIZE = 256
+
+DATE_NUMBER_WORDS = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+}
+
 REPORT_KEYWORDS = ["report", "analyse", "analyze"]
 
 REPORT_FIELDS = [
@@ -71,6 +176,14 @@ REPORT_FIELDS = [
 
 REPORT_FILE_NAME = "report.png"
 
+PILLOW_RENDERER = "pillow"
+
+DATAFRAME_IMAGE_RENDERER = "dataframe_image"
+
+REPORT_FONT_SIZE = 16
+
+REPORT_CACHE_SIZE = 256
+
 REPORT_RESPONSE = "Knowledge is power! 🧠💪 Here is your company report for $"
 
 CRYPTO_REPORT_RESPONSE = (
@@ -79,14 +192,101 @@ CRYPTO_REPORT_RESPONSE = (
 
 CONFIRMATION_MESSAGES = ["Sure thing buddy!", "You got it boss!", "Sounds good!"]
 
-FMP_API_RATING_ENDPOINT = "https://financialmodelingprep.com/api/v3/company/rating/"
+# Vendor base URLs can be overridden from the environment, e.g. for load tests
+FMP_API_URL = "https://financialmodelingprep.com/api/v3/"
+
+FMP_API_RATING_ENDPOINT = "company/rating/"
+
+FMP_API_GET_PRICE_ENDPOINT = "quote/"
+
+ALPHA_VANTAGE_API_URL = "https://www.alphavantage.co/query?"
 
-FMP_API_GET_PRICE_ENDPOINT = "https://financialmodelingprep.com/api/v3/quote/"
+GIPHY_API_URL = "http://api.giphy.com/v1"
+
+TWITTER_API_HOST = "api.twitter.com"
+
+TWITTER_UPLOAD_HOST = "upload.twitter.com"
 
 API_LIMIT_EXCEEDED_ERROR = (
     "Our standard API call frequency is 5 calls per minute and 500 calls per day."
 )
 
+ALPHA_VANTAGE = "alpha_vantage"
+
+FMP = "fmp"
+
+TWITTER = "twitter"
+
+GIPHY = "giphy"
+
+# (calls, period in seconds) per vendor, shortest period first
+VENDOR_RATE_LIMITS = {
+    ALPHA_VANTAGE: [(5, 60), (500, 24 * 60 * 60)],
+    FMP: [(250, 24 * 60 * 60)],
+    # Tweets and replies share a 300 per 3 hours write limit
+    TWITTER: [(300, 3 * 60 * 60)],
+}
+
+HTTP_TIMEOUT_SECONDS = 10
+
+HTTP_POOL_CONNECTIONS = 10
+
+HTTP_POOL_MAXSIZE_PER_HOST = 8
+
+PRIORITY_PUBLISH = 0
+
+PRIORITY_REPORT = 1
+
+PRIORITY_CREATE = 2
+
+PRIORITY_PREFETCH = 3
+
+PRIORITY_PURPOSES = {
+    PRIORITY_PUBLISH: "publish",
+    PRIORITY_REPORT: "report",
+    PRIORITY_CREATE: "create",
+    PRIORITY_PREFETCH: "prefetch",
+}
+
+# How long a request may wait for quota before it is deferred to the next cycle
+MAX_VENDOR_WAIT_SECONDS = {
+    PRIORITY_PUBLISH: 60,
+    PRIORITY_REPORT: 15,
+    PRIORITY_CREATE: 15,
+    # Prefetching only uses quota that is free right now
+    PRIORITY_PREFETCH: 0,
+}
+
+# Calls per day across all workers, counted from the vendor call ledger
+VENDOR_DAILY_BUDGETS = {
+    ALPHA_VANTAGE: 500,
+    FMP: 250,
+    GIPHY: 1000,
+}
+
+VENDOR_BUDGET_WARNING_SHARE = 0.75
+
+# Share of the daily budget each kind of work may use, reports are shed first
+VENDOR_BUDGET_SHARES = {
+    PRIORITY_PUBLISH: 1.0,
+    PRIORITY_REPORT: 0.8,
+    PRIORITY_CREATE: 0.95,
+    PRIORITY_PREFETCH: 0.8,
+}
+
+CALL_SUCCEEDED = "ok"
+
+CALL_FAILED = "error"
+
+CALL_RATE_LIMITED = "rate_limited"
+
+VENDOR_CALL_RETENTION_DAYS = 30
+
+# Matches PRICE_HISTORY_REFRESH_MINUTES so prefetched history is still fresh
+PREFETCH_LOOKAHEAD_MINUTES = 60
+
+PREFETCH_JOB_INTERVAL_MINUTES = 10
+
 HELP_MESSAGE = (
     "To create a reminder, mention me with one or more ticker "
     "symbols and a date. E.g. 'Remind me of $BTC in 3 months'. "
@@ -98,6 +298,10 @@ API_LIMIT_EXCEEDED_RESPONSE = (
     "Whoopsies. It looks like my api limit was exceeded. Please try again later "
 )
 
+PRICE_UNAVAILABLE_RESPONSE = (
+    "Sorry, I couldn't get the market data for your reminder about $"
+)
+
 STOCK_NOT_FOUND_RESPONSE = (
     "Sorry, I couldn't find any securities under that ticker 😓. "
     "I only support NASDAQ stocks and a few cryptocurrencies: "
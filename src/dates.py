@@ -0,0 +1,87 @@
+import re
+import threading
+from datetime import datetime, time
+from functools import lru_cache
+
+import parsedatetime
+import pytz
+from dateutil.relativedelta import relativedelta
+
+from . import const
+
+
+OFFSET_PATTERN = re.compile(
+    rf"\bin ({'|'.join(const.DATE_NUMBER_WORDS)}|\d+) "
+    r"(minute|hour|day|week|month|year)s?\b"
+)
+ANCHORED_PATTERN = re.compile(r"\b(?:tomorrow|next (?:day|week|month|year))\b")
+NOISE_PATTERN = re.compile(r"[@$]\w+")
+
+# Reference times used to check a cached rule agrees with parsedatetime,
+# chosen around month ends, leap days and midnight
+PROBE_TIMES = (
+    datetime(2021, 1, 31, 10, 5, 7),
+    datetime(2020, 2, 29, 23, 59, 59),
+    datetime(2020, 12, 31, 0, 0, 1),
+)
+
+calendars = threading.local()
+
+
+def calendar():
+    if not hasattr(calendars, "calendar"):
+        calendars.calendar = parsedatetime.Calendar(
+            version=parsedatetime.VERSION_CONTEXT_STYLE
+        )
+    return calendars.calendar
+
+
+def parse(phrase, reference):
+    result, _ = calendar().parseDT(phrase, tzinfo=pytz.utc, sourceTime=reference)
+    return result
+
+
+def normalize(text):
+    return " ".join(NOISE_PATTERN.sub("", text).lower().split())
+
+
+def resolve(text, reference):
+    phrase = normalize(text)
+    offset = phrase_offset(phrase)
+    if offset is not None:
+        return pytz.utc.localize(reference.replace(microsecond=0) + offset)
+    if is_anchored(phrase):
+        return resolve_on_day(phrase, reference.date())
+    return parse(phrase, reference)
+
+
+@lru_cache(maxsize=const.DATE_PHRASE_CACHE_SIZE)
+def phrase_offset(phrase):
+    match = OFFSET_PATTERN.search(phrase)
+    if match is None:
+        return None
+    amount, unit = match.groups()
+    amount = const.DATE_NUMBER_WORDS.get(amount) or int(amount)
+    offset = relativedelta(**{f"{unit}s": amount})
+    for probe in PROBE_TIMES:
+        if parse(phrase, probe) != pytz.utc.localize(probe + offset):
+            return None
+    return offset
+
+
+@lru_cache(maxsize=const.DATE_PHRASE_CACHE_SIZE)
+def is_anchored(phrase):
+    # Phrases like "tomorrow" resolve to a fixed time on a day relative to today
+    if ANCHORED_PATTERN.search(phrase) is None:
+        return False
+    return all(
+        parse(phrase, probe)
+        == parse(phrase, datetime.combine(probe.date(), time(hour)))
+        for probe in PROBE_TIMES
+        for hour in (0, 12, 23)
+    )
+
+
+@lru_cache(maxsize=const.DATE_PHRASE_CACHE_SIZE)
+def resolve_on_day(phrase, day):
+    return parse(phrase, datetime.combine(day, time()))
@@ -0,0 +1,57 @@
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from . import const
+from .models import Outbox, Reminder
+
+
+STAGE_SECONDS = Histogram(
+    "stock_reminder_stage_seconds",
+    "Time spent in each stage of handling mentions and reminders",
+    ["stage"],
+)
+VENDOR_REQUEST_SECONDS = Histogram(
+    "stock_reminder_vendor_request_seconds",
+    "Time spent waiting on vendor responses",
+    ["vendor", "endpoint"],
+)
+JOB_SECONDS = Histogram(
+    "stock_reminder_job_seconds", "Duration of scheduled jobs", ["job"]
+)
+MENTIONS_HANDLED = Counter("stock_reminder_mentions_handled", "Mentions replied to")
+REMINDERS_PUBLISHED = Counter(
+    "stock_reminder_reminders_published", "Reminders posted to Twitter"
+)
+ERRORS = Counter(
+    "stock_reminder_errors", "Errors by stage and exception type", ["stage", "type"]
+)
+REMINDER_LAG_SECONDS = Gauge(
+    "stock_reminder_lag_seconds",
+    "Seconds between remind_on and publishing for the latest batch",
+)
+BACKLOG = Gauge("stock_reminder_backlog", "Rows waiting to be processed", ["queue"])
+CACHE = Gauge(
+    "stock_reminder_cache",
+    "Size, hits, misses and evictions of caches",
+    ["cache", "stat"],
+)
+
+# Backlogs are counted when scraped
+BACKLOG.labels("reminders").set_function(lambda: Reminder.due_now().count())
+BACKLOG.labels("outbox").set_function(lambda: Outbox.pending(limit=None).count())
+
+
+def watch_cache(name, cache):
+    for stat in cache.stats():
+        CACHE.labels(name, stat).set_function(lambda stat=stat: cache.stats()[stat])
+
+
+def timed(stage):
+    return STAGE_SECONDS.labels(stage).time()
+
+
+def count_error(stage, error):
+    ERRORS.labels(stage, type(error).__name__).inc()
+
+
+def serve():
+    start_http_server(const.METRICS_PORT)
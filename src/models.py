@@ -1,4 +1,5 @@
-from datetime import datetime, timedelta
+import json
+from datetime import date, datetime, timedelta
 from os import environ
 
 from peewee import (
@@ -7,11 +8,21 @@ from peewee import (
     DateTimeField,
     CharField,
     FloatField,
+    ForeignKeyField,
+    IntegerField,
     Model,
     BooleanField,
     InternalError,
+    PostgresqlDatabase,
+    SQL,
+    TextField,
+    chunked,
+    fn,
 )
 from playhouse.db_url import connect
+from playhouse.migrate import SchemaMigrator, migrate as run_migrations
+
+from . import const
 
 # Use default sqlite db in tests
 db = connect(environ.get("DATABASE_URL") or "sqlite:///default.db")
@@ -22,7 +33,48 @@ class BaseModel(Model):
         database = db
 
 
-class Reminder(BaseModel):
+class ClaimableModel(BaseModel):
+    claimed_by = CharField(null=True)
+    claimed_until = DateTimeField(null=True)
+
+    @classmethod
+    def claim(cls, query, token):
+        # Rows are leased to a single worker, expired leases can be claimed again
+        database = cls._meta.database
+        now = datetime.now()
+        lease = now + timedelta(minutes=const.CLAIM_LEASE_MINUTES)
+        query = query.where(
+            cls.claimed_until.is_null() | (cls.claimed_until < now)
+        ).select(cls.id)
+        with database.atomic():
+            # SQLite has no row locks, it runs in single worker mode
+            if isinstance(database, PostgresqlDatabase):
+                query = query.for_update("FOR UPDATE SKIP LOCKED")
+            ids = [row.id for row in query]
+            if not ids:
+                return []
+            cls.update(claimed_by=token, claimed_until=lease).where(
+                cls.id.in_(ids)
+            ).execute()
+        return list(cls.select().where(cls.id.in_(ids)).order_by(cls.id))
+
+    @classmethod
+    def renew(cls, token):
+        lease = datetime.now() + timedelta(minutes=const.CLAIM_LEASE_MINUTES)
+        return cls.update(claimed_until=lease).where(cls.claimed_by == token).execute()
+
+    @classmethod
+    def release(cls, tokens):
+        if not tokens:
+            return 0
+        return (
+            cls.update(claimed_by=None, claimed_until=None)
+            .where(cls.claimed_by.in_(tokens))
+            .execute()
+        )
+
+
+class Reminder(ClaimableModel):
     user_name = CharField()
     tweet_id = BigIntegerField()
     created_on = DateField()
@@ -31,6 +83,8 @@ class Reminder(BaseModel):
     stock_price = FloatField()
     short = BooleanField(default=False)
     is_finished = BooleanField(default=False)
+    attempts = IntegerField(default=0)
+    retry_after = DateTimeField(null=True)
 
     class Meta:
         table_name = "reminders"
@@ -39,43 +93,475 @@ class Reminder(BaseModel):
         self.is_finished = True
         self.save()
 
+    def retry_later(self):
+        self.attempts += 1
+        if self.attempts < const.REMINDER_MAX_ATTEMPTS:
+            delay = min(
+                const.REMINDER_RETRY_BASE_SECONDS * 2 ** (self.attempts - 1),
+                const.REMINDER_RETRY_MAX_SECONDS,
+            )
+            self.retry_after = datetime.now() + timedelta(seconds=delay)
+        self.save(only=[Reminder.attempts, Reminder.retry_after])
+
     def refresh_from_db(self):
         return Reminder.get_by_id(self.id)
 
     @classmethod
-    def create_instance(cls, values):
+    def create_many(cls, values_list):
         with db.atomic() as transaction:
             try:
-                Reminder.create(
-                    user_name=values["user_name"],
-                    tweet_id=values["tweet_id"],
-                    created_on=values["created_on"],
-                    remind_on=values["remind_on"],
-                    stock_symbol=values["stock_symbol"],
-                    stock_price=values["stock_price"],
-                    short=values["short"],
-                )
+                for batch in chunked(values_list, const.INSERT_BATCH_SIZE):
+                    cls.insert_many(batch).execute()
             except InternalError:
                 transaction.rollback()
 
+    @classmethod
+    def finish_many(cls, ids, token):
+        # Rows whose lease expired and were claimed by another worker are its to finish
+        if not ids:
+            return []
+        query = cls.select(cls.id).where(cls.id.in_(ids), cls.claimed_by == token)
+        with db.atomic():
+            if isinstance(cls._meta.database, PostgresqlDatabase):
+                query = query.for_update()
+            finished = [row.id for row in query]
+            if finished:
+                cls.update(is_finished=True).where(cls.id.in_(finished)).execute()
+        return finished
+
     @classmethod
     def due_now(cls):
+        # Everything overdue is due, so reminders missed by a failed or slow
+        # cycle are published by the next one
+        return cls.due_within(const.REMINDER_LOOKAHEAD_MINUTES)
+
+    @classmethod
+    def due_within(cls, minutes):
+        now = datetime.now()
         return cls.select().where(
-            cls.remind_on.between(
-                # TODO: I think this should rather fetch all reminders for today's date.
-                #  If the job fails, upon retry, the reminder might not be fetched if
-                #  it's outside of the 6 min window
-                datetime.now() - timedelta(minutes=3),
-                datetime.now() + timedelta(minutes=3),
-            ),
             cls.is_finished == False,  # noqa
+            cls.remind_on <= now + timedelta(minutes=minutes),
+            cls.retry_after.is_null() | (cls.retry_after <= now),
+        )
+
+    @classmethod
+    def claim_due(cls, token, batch_size=const.DUE_BATCH_SIZE):
+        return cls.claim(cls.due_now().order_by(cls.id).limit(batch_size), token)
+
+
+Reminder.add_index(
+    Reminder.index(
+        Reminder.remind_on,
+        name="reminders_due_remind_on",
+        where=SQL('"is_finished" = false'),
+    )
+)
+
+
+class Outbox(ClaimableModel):
+    status = TextField()
+    in_reply_to_status_id = BigIntegerField(index=True)
+    media_id = BigIntegerField(null=True)
+    reminder = ForeignKeyField(Reminder, null=True, backref="messages")
+    attempts = IntegerField(default=0)
+    send_after = DateTimeField()
+    sent_at = DateTimeField(null=True)
+    failed_at = DateTimeField(null=True)
+    last_error = TextField(null=True)
+
+    class Meta:
+        table_name = "outbox"
+
+    def update_status_kwargs(self):
+        kwargs = {
+            "status": self.status,
+            "in_reply_to_status_id": self.in_reply_to_status_id,
+        }
+        if self.media_id is not None:
+            kwargs["media_ids"] = [self.media_id]
+        return kwargs
+
+    def mark_sent(self):
+        self.sent_at = datetime.now()
+        self.save()
+
+    def retry_later(self, error):
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= const.OUTBOX_MAX_ATTEMPTS:
+            self.failed_at = datetime.now()
+        else:
+            delay = min(
+                const.OUTBOX_RETRY_BASE_SECONDS * 2 ** (self.attempts - 1),
+                const.OUTBOX_RETRY_MAX_SECONDS,
+            )
+            self.send_after = datetime.now() + timedelta(seconds=delay)
+        self.save()
+
+    def fail(self, error):
+        self.attempts += 1
+        self.last_error = str(error)
+        self.failed_at = datetime.now()
+        self.save()
+
+    @classmethod
+    def enqueue(cls, status, in_reply_to_status_id, media_id=None):
+        return cls.create(
+            status=status,
+            in_reply_to_status_id=in_reply_to_status_id,
+            media_id=media_id,
+            send_after=datetime.now(),
+        )
+
+    @classmethod
+    def enqueue_many(cls, values_list):
+        now = datetime.now()
+        values_list = [dict(values, send_after=now) for values in values_list]
+        for batch in chunked(values_list, const.INSERT_BATCH_SIZE):
+            cls.insert_many(batch).execute()
+
+    @classmethod
+    def answered(cls, status_ids):
+        answered = set()
+        for batch in chunked(status_ids, const.INSERT_BATCH_SIZE):
+            query = cls.select(cls.in_reply_to_status_id).where(
+                cls.in_reply_to_status_id.in_(batch)
+            )
+            answered.update(message.in_reply_to_status_id for message in query)
+        return answered
+
+    @classmethod
+    def pending(cls, limit=const.OUTBOX_BATCH_SIZE):
+        return (
+            cls.select()
+            .where(
+                cls.sent_at.is_null(),
+                cls.failed_at.is_null(),
+                cls.send_after <= datetime.now(),
+            )
+            .order_by(cls.id)
+            .limit(limit)
         )
 
+    @classmethod
+    def claim_pending(cls, token, limit=const.OUTBOX_BATCH_SIZE):
+        return cls.claim(cls.pending(limit), token)
+
+
+Outbox.add_index(
+    Outbox.index(
+        Outbox.send_after,
+        name="outbox_pending_send_after",
+        # SQLite rejects bound parameters in partial index predicates
+        where=SQL('"sent_at" IS NULL AND "failed_at" IS NULL'),
+    )
+)
+
+
+class CompanyOverview(BaseModel):
+    stock_symbol = CharField(unique=True)
+    data = TextField()
+    fetched_at = DateTimeField()
+
+    class Meta:
+        table_name = "company_overviews"
+
+    @property
+    def payload(self):
+        return json.loads(self.data)
+
+    def is_stale(self):
+        if self.fetched_at.date() < date.today():
+            return True
+        # Split details are updated by the vendor around the split date
+        max_age = timedelta(minutes=const.OVERVIEW_SPLIT_REFRESH_MINUTES)
+        return self.split_is_near() and datetime.now() - self.fetched_at > max_age
+
+    def split_is_near(self):
+        last_split_date = self.payload.get("LastSplitDate")
+        if last_split_date in [None, "None"]:
+            return False
+        split_date = datetime.strptime(last_split_date, "%Y-%m-%d").date()
+        return abs((split_date - date.today()).days) <= const.OVERVIEW_SPLIT_WINDOW_DAYS
+
+    @classmethod
+    def get_fresh(cls, stock_symbol):
+        overview = cls.get_or_none(cls.stock_symbol == stock_symbol)
+        if overview is None or overview.is_stale():
+            return None
+        return overview.payload
+
+    @classmethod
+    def store(cls, stock_symbol, data):
+        cls.insert(
+            stock_symbol=stock_symbol, data=json.dumps(data), fetched_at=datetime.now()
+        ).on_conflict(
+            conflict_target=[cls.stock_symbol],
+            preserve=[cls.data, cls.fetched_at],
+        ).execute()
+
+
+class PriceHistory(BaseModel):
+    stock_symbol = CharField(unique=True)
+    synced_at = DateTimeField()
+    is_full = BooleanField(default=False)
+    covered_from = DateField(null=True)
+
+    class Meta:
+        table_name = "price_histories"
+
+    def is_stale(self):
+        max_age = timedelta(minutes=const.PRICE_HISTORY_REFRESH_MINUTES)
+        return datetime.now() - self.synced_at > max_age
+
+    def covers(self, since):
+        return self.is_full or since >= self.covered_from
+
+
+class DailyPrice(BaseModel):
+    stock_symbol = CharField()
+    day = DateField()
+    close = FloatField()
+    dividend = FloatField(default=0.0)
+    # Running total of all dividends paid up to and including this day
+    cumulative_dividend = FloatField()
+
+    class Meta:
+        table_name = "daily_prices"
+        indexes = ((("stock_symbol", "day"), True),)
+
+    @classmethod
+    def last_day(cls, stock_symbol):
+        row = (
+            cls.select(cls.day)
+            .where(cls.stock_symbol == stock_symbol)
+            .order_by(cls.day.desc())
+            .first()
+        )
+        return row.day if row else None
+
+    @classmethod
+    def cumulative_dividend_on(cls, stock_symbol, day):
+        row = (
+            cls.select(cls.cumulative_dividend)
+            .where(cls.stock_symbol == stock_symbol, cls.day <= day)
+            .order_by(cls.day.desc())
+            .first()
+        )
+        return row.cumulative_dividend if row else 0.0
+
+    @classmethod
+    def dividend_between(cls, stock_symbol, start, end):
+        # Dividends paid after start and up to and including end
+        dividend = cls.cumulative_dividend_on(
+            stock_symbol, end
+        ) - cls.cumulative_dividend_on(stock_symbol, start)
+        return round(dividend, const.DIVIDEND_PRECISION)
+
+    @classmethod
+    def store_history(cls, stock_symbol, prices, is_full):
+        # prices is a list of (day, close, dividend) tuples in any order
+        prices = sorted(prices)
+        with db.atomic():
+            if is_full:
+                start = None
+                cls.delete().where(cls.stock_symbol == stock_symbol).execute()
+            else:
+                start = cls.last_day(stock_symbol)
+                if start is not None:
+                    cls.delete().where(
+                        cls.stock_symbol == stock_symbol, cls.day >= start
+                    ).execute()
+            cumulative_dividend = (
+                cls.cumulative_dividend_on(stock_symbol, start) if start else 0.0
+            )
+            rows = []
+            for day, close, dividend in prices:
+                if start is not None and day < start:
+                    continue
+                cumulative_dividend += dividend
+                rows.append(
+                    {
+                        "stock_symbol": stock_symbol,
+                        "day": day,
+                        "close": close,
+                        "dividend": dividend,
+                        "cumulative_dividend": cumulative_dividend,
+                    }
+                )
+            for batch in chunked(rows, const.INSERT_BATCH_SIZE):
+                cls.insert_many(batch).execute()
+            update = {PriceHistory.synced_at: datetime.now()}
+            if is_full:
+                update[PriceHistory.is_full] = True
+            PriceHistory.insert(
+                stock_symbol=stock_symbol,
+                synced_at=datetime.now(),
+                is_full=is_full,
+                covered_from=None if is_full else compact_start(),
+            ).on_conflict(
+                conflict_target=[PriceHistory.stock_symbol], update=update
+            ).execute()
+
+
+class Cursor(BaseModel):
+    name = CharField(unique=True)
+    position = BigIntegerField()
+
+    class Meta:
+        table_name = "cursors"
+
+    @classmethod
+    def get_position(cls, name):
+        cursor = cls.get_or_none(cls.name == name)
+        return cursor.position if cursor else None
+
+    @classmethod
+    def advance(cls, name, position):
+        cls.insert(name=name, position=position).on_conflict(
+            conflict_target=[cls.name], update={cls.position: position}
+        ).execute()
+
+
+class MentionFailure(BaseModel):
+    status_id = BigIntegerField(unique=True)
+    attempts = IntegerField(default=1)
+
+    class Meta:
+        table_name = "mention_failures"
+
+    @classmethod
+    def record(cls, status_id):
+        cls.insert(status_id=status_id).on_conflict(
+            conflict_target=[cls.status_id], update={cls.attempts: cls.attempts + 1}
+        ).execute()
+        return cls.get(cls.status_id == status_id).attempts
+
+
+class PooledMedia(BaseModel):
+    sentiment = CharField(index=True)
+    media_id = BigIntegerField()
+    expires_at = DateTimeField()
+
+    class Meta:
+        table_name = "pooled_media"
+
+    @classmethod
+    def valid(cls, sentiment):
+        return cls.select().where(
+            (cls.sentiment == sentiment) & (cls.expires_at > datetime.now())
+        )
+
+    @classmethod
+    def pick(cls, sentiment):
+        media = cls.valid(sentiment).order_by(fn.Random()).first()
+        return media.media_id if media else None
+
+    @classmethod
+    def add(cls, sentiment, media_id):
+        expires_at = datetime.now() + timedelta(hours=const.MEDIA_ID_TTL_HOURS)
+        return cls.create(sentiment=sentiment, media_id=media_id, expires_at=expires_at)
+
+    @classmethod
+    def purge_expired(cls):
+        return cls.delete().where(cls.expires_at <= datetime.now()).execute()
+
+
+class VendorCall(BaseModel):
+    vendor = CharField()
+    endpoint = CharField()
+    symbol = CharField(null=True)
+    purpose = CharField()
+    status = CharField()
+    latency = FloatField()
+    day = DateField()
+    created_at = DateTimeField()
+
+    class Meta:
+        table_name = "vendor_calls"
+        indexes = ((("vendor", "day"), False),)
+
+    @classmethod
+    def record(cls, vendor, endpoint, symbol, purpose, status, latency):
+        now = datetime.now()
+        return cls.create(
+            vendor=vendor,
+            endpoint=endpoint,
+            symbol=symbol,
+            purpose=purpose,
+            status=status,
+            latency=latency,
+            day=now.date(),
+            created_at=now,
+        )
+
+    @classmethod
+    def used_today(cls, vendor):
+        return (
+            cls.select()
+            .where((cls.vendor == vendor) & (cls.day == date.today()))
+            .count()
+        )
+
+    @classmethod
+    def daily_usage(cls, day):
+        calls = fn.COUNT(cls.id)
+        return list(
+            cls.select(
+                cls.vendor,
+                cls.endpoint,
+                cls.purpose,
+                cls.status,
+                calls.alias("calls"),
+                fn.AVG(cls.latency).alias("average_latency"),
+            )
+            .where(cls.day == day)
+            .group_by(cls.vendor, cls.endpoint, cls.purpose, cls.status)
+            .order_by(cls.vendor, calls.desc())
+            .dicts()
+        )
+
+    @classmethod
+    def purge_before(cls, day):
+        return cls.delete().where(cls.day < day).execute()
+
+
+def compact_start():
+    return date.today() - timedelta(days=const.COMPACT_HISTORY_DAYS)
+
+
+def add_missing_columns(model):
+    database = model._meta.database
+    table = model._meta.table_name
+    columns = {column.name for column in database.get_columns(table)}
+    migrator = SchemaMigrator.from_database(database)
+    run_migrations(
+        *[
+            migrator.add_column(table, field.column_name, field)
+            for field in model._meta.sorted_fields
+            if field.column_name not in columns
+        ]
+    )
+
 
 def migrate():
-    tables = db.get_tables()
-    if [Reminder] not in tables:
-        db.create_tables([Reminder])
+    db.create_tables(
+        [
+            Reminder,
+            Outbox,
+            CompanyOverview,
+            PriceHistory,
+            DailyPrice,
+            Cursor,
+            MentionFailure,
+            PooledMedia,
+            VendorCall,
+        ]
+    )
+    # Tables created before workers claimed rows lack the lease columns
+    add_missing_columns(Reminder)
+    add_missing_columns(Outbox)
+    Outbox._schema.create_indexes(safe=True)
 
 
 if __name__ == "__main__":
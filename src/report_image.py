@@ -0,0 +1,53 @@
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+from . import const
+
+
+def load_font(name, size):
+    try:
+        return ImageFont.truetype(name, size)
+    except OSError:
+        # Slim images ship without system fonts
+        return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=None)
+def fonts(size):
+    return load_font("DejaVuSans.ttf", size), load_font("DejaVuSans-Bold.ttf", size)
+
+
+def render_table(data, font_size=const.REPORT_FONT_SIZE):
+    regular, bold = fonts(font_size)
+    rows = [(str(key), str(value)) for key, value in data.items()]
+    measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    # An empty report still renders its header, like an empty data frame
+    label_width = max(
+        (measure.textlength(label, font=bold) for label, _ in rows), default=0
+    )
+    value_width = max(
+        (measure.textlength(value, font=regular) for _, value in rows), default=0
+    )
+
+    padding = font_size // 2
+    row_height = font_size * 2
+    width = int(label_width + value_width) + 4 * padding
+    # The first row is left empty like the blank header of a one column frame
+    height = row_height * (len(rows) + 1) + padding
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    draw.line([(padding, row_height), (width - padding, row_height)], "black", 2)
+
+    label_right = padding + label_width
+    value_right = width - padding
+    for index, (label, value) in enumerate(rows, start=1):
+        middle = row_height * index + row_height // 2
+        draw.text((label_right, middle), label, "black", bold, anchor="rm")
+        draw.text((value_right, middle), value, "black", regular, anchor="rm")
+
+    output = BytesIO()
+    image.save(output, format="PNG")
+    output.seek(0)
+    return output
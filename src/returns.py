@@ -0,0 +1,41 @@
+import numpy as np
+
+from . import const
+
+
+# Scaled values this close to a half are rounded by Python instead of NumPy
+HALF_TOLERANCE = 1e-6
+
+
+def round_like_python(values, digits=2):
+    # np.round rounds the scaled float, Python rounds the exact binary value,
+    # e.g. 2.675 becomes 2.68 and 2.67. They only disagree right next to a half
+    rounded = np.round(values, digits)
+    scaled = values * 10**digits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < HALF_TOLERANCE
+    for index in np.flatnonzero(near_half):
+        rounded[index] = round(float(values[index]), digits)
+    return rounded
+
+
+def calculate_returns(original_prices, current_prices, dividends):
+    return round_like_python(
+        ((current_prices - original_prices + dividends) / original_prices) * 100
+    )
+
+
+def investment_returns(entry_prices, split_factors, dividends, current_prices, shorts):
+    entry_prices = np.asarray(entry_prices, dtype=float)
+    adjusted_prices = entry_prices / np.asarray(split_factors, dtype=float)
+    rates = calculate_returns(
+        adjusted_prices,
+        np.asarray(current_prices, dtype=float),
+        np.asarray(dividends, dtype=float),
+    )
+    rates = np.where(np.asarray(shorts, dtype=bool), -rates, rates)
+    sentiments = np.select(
+        [rates < 0, rates == 0],
+        [const.NEGATIVE_SENTIMENT, const.ZERO_SENTIMENT],
+        const.POSITIVE_SENTIMENT,
+    )
+    return adjusted_prices.tolist(), rates.tolist(), sentiments.tolist()
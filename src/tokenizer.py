@@ -0,0 +1,69 @@
+import re
+from collections import namedtuple
+
+from . import const
+
+
+Intent = namedtuple(
+    "Intent", ["cashtags", "demands_report", "is_short", "date_span", "is_thread"]
+)
+
+MONTHS = (
+    r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?"
+)
+
+DATE_EXPRESSIONS = (
+    # Relative phrases such as "3 days" or "tomorrow", weekdays included
+    "|".join(re.escape(string) for string in const.DATE_TIME_STRINGS),
+    "minute",
+    rf"\b(?:{MONTHS})\b",
+    r"\b\d{1,4}[/-]\d{1,2}(?:[/-]\d{2,4})?\b",
+    r"\b\d{1,2}(?::\d{2})?\s?[ap]m\b",
+    r"\b(?:19|20)\d{2}\b",
+)
+
+TOKEN_PATTERN = re.compile(
+    r"(?P<cashtag>[$][A-Za-z]+)"
+    rf"|(?P<report>{'|'.join(const.REPORT_KEYWORDS)})"
+    r"|(?P<short>short)"
+    rf"|(?P<date>{'|'.join(DATE_EXPRESSIONS)})",
+    re.IGNORECASE,
+)
+
+
+def tokenize(text, is_thread=False):
+    cashtags = []
+    demands_report = is_short = False
+    date_start = date_end = None
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == "cashtag":
+            cashtags.append(match.group())
+        elif kind == "report":
+            demands_report = True
+        elif kind == "short":
+            is_short = True
+        else:
+            if date_start is None:
+                date_start = match.start()
+            date_end = match.end()
+    return Intent(
+        cashtags=cashtags,
+        demands_report=demands_report and bool(cashtags),
+        is_short=is_short,
+        date_span=None if date_start is None else (date_start, date_end),
+        is_thread=is_thread,
+    )
+
+
+def parse_mention(mention):
+    return tokenize(mention.text, is_thread=bool(mention.in_reply_to_status_id))
+
+
+def is_valid(intent):
+    return intent.demands_report or bool(intent.cashtags and intent.date_span)
+
+
+def stock_symbols(intent):
+    return [cashtag.replace("$", "") for cashtag in intent.cashtags]
@@ -0,0 +1,266 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+from functools import lru_cache
+from os import environ
+
+import giphy_client
+import requests
+from alpha_vantage import alphavantage
+from requests.adapters import HTTPAdapter
+
+from . import const, metrics
+from .models import VendorCall
+
+
+logger = logging.getLogger(__name__)
+
+current_priority = ContextVar("current_priority", default=const.PRIORITY_CREATE)
+
+
+class RequestDeferred(Exception):
+    pass
+
+
+class BudgetExceeded(RequestDeferred):
+    pass
+
+
+@contextmanager
+def priority(value):
+    token = current_priority.set(value)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def wait_time(self):
+        self.refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def exhaust(self):
+        self.refill()
+        self.tokens = min(self.tokens, 0)
+
+
+class PendingCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class RequestScheduler:
+    def __init__(self, limits):
+        self.limits = limits
+        self.reset()
+
+    def reset(self):
+        self._condition = threading.Condition()
+        self._buckets = {
+            vendor: [TokenBucket(capacity, period) for capacity, period in limits]
+            for vendor, limits in self.limits.items()
+        }
+        self._queues = {vendor: [] for vendor in self.limits}
+        self._in_flight = {}
+        self._tickets = itertools.count()
+
+    def request(self, vendor, endpoint, func, *args, stock=None, **kwargs):
+        # Identical requests already in flight share the first caller's response
+        key = (vendor, endpoint, args, tuple(sorted(kwargs.items())))
+        with self._condition:
+            pending = self._in_flight.get(key)
+            is_owner = pending is None
+            if is_owner:
+                pending = self._in_flight[key] = PendingCall()
+        if not is_owner:
+            return pending.result()
+
+        try:
+            check_budget(vendor, current_priority.get())
+            self.acquire(vendor, current_priority.get())
+            with recorded(vendor, endpoint, stock):
+                pending.value = func(*args, **kwargs)
+            return pending.value
+        except Exception as error:
+            if const.API_LIMIT_EXCEEDED_ERROR in str(error):
+                self.exhaust(vendor)
+            pending.error = error
+            raise
+        finally:
+            with self._condition:
+                del self._in_flight[key]
+            pending.done.set()
+
+    def acquire(self, vendor, priority):
+        if vendor not in self._buckets:
+            return
+        buckets = self._buckets[vendor]
+        queue = self._queues[vendor]
+        max_wait = const.MAX_VENDOR_WAIT_SECONDS[priority]
+        ticket = (priority, next(self._tickets))
+        started_at = time.monotonic()
+        with self._condition:
+            heapq.heappush(queue, ticket)
+            try:
+                while True:
+                    remaining = max_wait - (time.monotonic() - started_at)
+                    timeout = None
+                    # Higher priority requests queued ahead of this one go first
+                    if queue[0] == ticket:
+                        timeout = max(bucket.wait_time() for bucket in buckets)
+                        if timeout == 0:
+                            for bucket in buckets:
+                                bucket.consume()
+                            return
+                    if remaining <= 0 or (timeout or 0) > remaining:
+                        raise RequestDeferred(
+                            f"{vendor} quota exhausted, deferring request"
+                        )
+                    self._condition.wait(remaining if timeout is None else timeout)
+            finally:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                self._condition.notify_all()
+
+    def exhaust(self, vendor):
+        logger.warning(f"{vendor} reported its rate limit was exceeded")
+        with self._condition:
+            # Limits are listed shortest period first
+            for bucket in self._buckets.get(vendor, [])[:1]:
+                bucket.exhaust()
+
+
+scheduler = RequestScheduler(const.VENDOR_RATE_LIMITS)
+request = scheduler.request
+
+budget_warnings = set()
+
+
+def check_budget(vendor, priority):
+    budget = const.VENDOR_DAILY_BUDGETS.get(vendor)
+    if budget is None:
+        return
+    used = VendorCall.used_today(vendor)
+    warning = (vendor, date.today())
+    if (
+        used >= budget * const.VENDOR_BUDGET_WARNING_SHARE
+        and warning not in budget_warnings
+    ):
+        budget_warnings.add(warning)
+        logger.warning(f"{vendor} has used {used} of its {budget} daily calls")
+    if used >= budget * const.VENDOR_BUDGET_SHARES[priority]:
+        raise BudgetExceeded(
+            f"{vendor} has used {used} of its {budget} daily calls, "
+            f"shedding {const.PRIORITY_PURPOSES[priority]} requests"
+        )
+
+
+@contextmanager
+def recorded(vendor, endpoint, stock=None):
+    # Every outbound call goes to the ledger, whichever code path made it
+    status = const.CALL_SUCCEEDED
+    started_at = time.monotonic()
+    try:
+        yield
+    except Exception as error:
+        status = call_status(error)
+        metrics.count_error(vendor, error)
+        raise
+    finally:
+        latency = time.monotonic() - started_at
+        metrics.VENDOR_REQUEST_SECONDS.labels(vendor, endpoint).observe(latency)
+        VendorCall.record(
+            vendor,
+            endpoint,
+            stock,
+            const.PRIORITY_PURPOSES[current_priority.get()],
+            status,
+            latency,
+        )
+
+
+def call_status(error):
+    response = getattr(error, "response", None)
+    if const.API_LIMIT_EXCEEDED_ERROR in str(error) or (
+        response is not None and response.status_code == 429
+    ):
+        return const.CALL_RATE_LIMITED
+    return const.CALL_FAILED
+
+
+def create_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=const.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=const.HTTP_POOL_MAXSIZE_PER_HOST,
+        pool_block=True,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+session = create_session()
+
+
+def http_get(url, **kwargs):
+    kwargs.setdefault("timeout", const.HTTP_TIMEOUT_SECONDS)
+    return session.get(url, **kwargs)
+
+
+class PooledRequests:
+    get = staticmethod(http_get)
+
+
+# alpha_vantage calls requests.get directly, point it at the shared pool instead
+alphavantage.requests = PooledRequests()
+alphavantage.AlphaVantage._ALPHA_VANTAGE_API_URL = environ.get(
+    "ALPHA_VANTAGE_API_URL", const.ALPHA_VANTAGE_API_URL
+)
+
+
+@lru_cache(maxsize=None)
+def alpha_vantage_client(client_class):
+    return client_class(key=environ["ALPHA_VANTAGE_API_KEY"])
+
+
+@lru_cache(maxsize=None)
+def giphy_api():
+    host = environ.get("GIPHY_API_URL", const.GIPHY_API_URL)
+    return giphy_client.DefaultApi(giphy_client.ApiClient(host=host))
+
+
+def fmp_url(endpoint, stock):
+    base_url = environ.get("FMP_API_URL", const.FMP_API_URL)
+    return f'{base_url}{endpoint}{stock}?apikey={environ["FMP_API_KEY"]}'
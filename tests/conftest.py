@@ -5,15 +5,37 @@ import pytest
 from peewee import SqliteDatabase
 from tweepy import Status, User
 
+from src import bot, vendors
 from src.const import API_LIMIT_EXCEEDED_ERROR
-from src.models import Reminder
-
-MODELS = [Reminder]
+from src.models import (
+    CompanyOverview,
+    Cursor,
+    DailyPrice,
+    MentionFailure,
+    Outbox,
+    PooledMedia,
+    PriceHistory,
+    Reminder,
+    VendorCall,
+)
+
+MODELS = [
+    Reminder,
+    Outbox,
+    CompanyOverview,
+    PriceHistory,
+    DailyPrice,
+    Cursor,
+    MentionFailure,
+    PooledMedia,
+    VendorCall,
+]
 
 
 @pytest.fixture(autouse=True)
 def setup_test_db():
-    test_db = SqliteDatabase(":memory:")
+    # Share the in-memory database with the threads handling mentions
+    test_db = SqliteDatabase(":memory:", thread_safe=False, check_same_thread=False)
     test_db.bind(MODELS)
     test_db.connect()
     test_db.create_tables(MODELS)
@@ -31,9 +53,22 @@ def mock_env_variables(monkeypatch):
     monkeypatch.setenv("FMP_API_KEY", "123")
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    bot.quote_cache.clear()
+    bot.report_cache.clear()
+    vendors.budget_warnings.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_request_scheduler():
+    vendors.scheduler.reset()
+
+
 @pytest.fixture(autouse=True)
 def mock_tweepy():
     with patch("src.bot.init_tweepy") as mock:
+        mock.return_value.media_upload.return_value.media_id = 1234
         yield mock
 
 
@@ -58,7 +93,7 @@ def mock_random():
 
 @pytest.fixture
 def mock_fmp_api_rating_response():
-    with patch("requests.get") as mock:
+    with patch("src.vendors.http_get") as mock:
         json_response = {
             "symbol": "AMZN",
             "rating": {"score": 4, "rating": "A+", "recommendation": "Buy"},
@@ -78,7 +113,7 @@ def mock_fmp_api_rating_response():
 
 @pytest.fixture
 def mock_fmp_api_empty_rating_response():
-    with patch("requests.get") as mock:
+    with patch("src.vendors.http_get") as mock:
         json_response = {}
         mock.return_value = Mock()
         mock.return_value.json.return_value = json_response
@@ -87,7 +122,7 @@ def mock_fmp_api_empty_rating_response():
 
 @pytest.fixture
 def mock_fmp_api_get_price_response():
-    with patch("requests.get") as mock:
+    with patch("src.vendors.http_get") as mock:
         json_response = [
             {
                 "symbol": "AAPL",
@@ -0,0 +1,28 @@
+from freezegun import freeze_time
+
+from src.cache import TTLCache
+
+
+class TestTTLCache:
+    def test_returns_value_until_it_expires(self):
+        cache = TTLCache(max_size=2)
+        with freeze_time("2021-01-07T15:31:00Z") as frozen_time:
+            cache.set("AMZN", 3112.70, ttl=60)
+            frozen_time.tick(59)
+            assert cache.get("AMZN") == 3112.70
+            frozen_time.tick(1)
+            assert cache.get("AMZN") is None
+
+        assert cache.stats() == {"size": 0, "hits": 1, "misses": 1, "evictions": 0}
+
+    def test_evicts_least_recently_used_entry_when_full(self):
+        cache = TTLCache(max_size=2)
+        cache.set("AMZN", 3112.70, ttl=60)
+        cache.set("TSLA", 661.70, ttl=60)
+        cache.get("AMZN")
+        cache.set("JNJ", 157.11, ttl=60)
+
+        assert cache.get("TSLA") is None
+        assert cache.get("AMZN") == 3112.70
+        assert cache.get("JNJ") == 157.11
+        assert cache.stats()["evictions"] == 1
@@ -0,0 +1,38 @@
+import importlib
+import logging
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setenv("SENTRY_PROJECT_URL", "")
+    return importlib.import_module("src.clock")
+
+
+class TestTracked:
+    def test_warns_when_job_takes_longer_than_its_interval(self, clock, caplog):
+        labels = {"job": "slow_job"}
+        runs = REGISTRY.get_sample_value("stock_reminder_job_seconds_count", labels)
+
+        @clock.tracked(60)
+        def slow_job():
+            return "done"
+
+        with patch("src.clock.time") as mock_time, caplog.at_level(logging.INFO):
+            mock_time.monotonic.side_effect = [0, 90]
+            assert slow_job() == "done"
+
+        assert caplog.record_tuples == [
+            (
+                "src.clock",
+                logging.WARNING,
+                "slow_job took 90.0s, longer than its 60s interval",
+            )
+        ]
+        assert (
+            REGISTRY.get_sample_value("stock_reminder_job_seconds_count", labels)
+            == (runs or 0) + 1
+        )
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import parsedatetime
+import pytest
+import pytz
+
+from src import dates
+
+
+def parsedatetime_result(text, reference):
+    cal = parsedatetime.Calendar(version=parsedatetime.VERSION_CONTEXT_STYLE)
+    result, _ = cal.parseDT(text, tzinfo=pytz.utc, sourceTime=reference)
+    return result
+
+
+REFERENCES = [
+    datetime(2020, 12, 13, 15, 32, 0, 123456),
+    datetime(2021, 1, 31, 23, 59, 59),
+    datetime(2021, 3, 31, 8, 0),
+    datetime(2024, 2, 29, 12, 30),
+]
+
+
+class TestResolve:
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "@stock_reminder $AMZN in 3 months",
+            "$BTC in 20 minutes",
+            "in one week",
+            "in a month",
+            "$MSFT in 2 years",
+            "in an hour",
+            "Remind me of $AMZN, $AAPL and $BABA in 3 months.",
+            "tomorrow",
+            "Remind me next year of: $VEEV $ABBV",
+            "$AMZN next week",
+            "in twelve months",
+            "$msft 1/28/2021",
+            "$AMZN on friday at 3pm",
+        ],
+    )
+    @pytest.mark.parametrize("reference", REFERENCES)
+    def test_matches_parsedatetime(self, text, reference):
+
+        assert dates.resolve(text, reference) == parsedatetime_result(
+            dates.normalize(text), reference
+        )
+
+    def test_caches_verified_offsets(self):
+        offset = dates.phrase_offset("in 3 months")
+
+        assert offset.months == 3
+        assert dates.phrase_offset("in 3 months") is offset
+
+    def test_does_not_cache_offsets_parsedatetime_disagrees_with(self):
+
+        assert dates.phrase_offset("in twelve months") is None
+        assert dates.phrase_offset("in 3 months at 3pm") is None
+
+    def test_resolves_anchored_phrases_once_per_day(self):
+        reference = datetime(2021, 1, 31, 10, 5)
+
+        first = dates.resolve("tomorrow", reference)
+        later = dates.resolve("tomorrow", reference + timedelta(hours=5))
+
+        assert first is later
+        assert first == datetime(2021, 2, 1, 9, 0, tzinfo=pytz.utc)
+
+    def test_normalizes_mentions_and_cashtags(self):
+
+        assert dates.normalize("@stock_reminder  $AMZN In 3   Months") == (
+            "in 3 months"
+        )
@@ -1,6 +1,10 @@
+from datetime import datetime
+
 import pytest
+import pytz
+from dateutil.parser import parse
 
-from src import bot
+from src import bot, const
 from freezegun import freeze_time
 
 
@@ -56,3 +60,50 @@ class TestGetPrice:
 
         assert price == 3138.38
         mock_alpha_vantage_get_quote_amazon.assert_called_once_with("AMZN")
+
+    def test_returns_cached_price_while_market_is_open(
+        self, mock_alpha_vantage_get_intraday
+    ):
+        with freeze_time("2021-01-07T15:31:00Z") as frozen_time:
+            bot.get_price("AMZN")
+            frozen_time.tick(const.OPEN_MARKET_QUOTE_TTL_SECONDS - 1)
+            price = bot.get_price("AMZN")
+
+        assert price == 3112.70
+        mock_alpha_vantage_get_intraday.assert_called_once_with("AMZN")
+        assert bot.quote_cache.stats()["hits"] == 1
+
+    def test_refetches_price_when_cached_quote_expires_while_market_is_open(
+        self, mock_alpha_vantage_get_intraday
+    ):
+        with freeze_time("2021-01-07T15:31:00Z") as frozen_time:
+            bot.get_price("AMZN")
+            frozen_time.tick(const.OPEN_MARKET_QUOTE_TTL_SECONDS)
+            bot.get_price("AMZN")
+
+        assert mock_alpha_vantage_get_intraday.call_count == 2
+
+    def test_caches_closing_price_until_market_opens(
+        self, mock_alpha_vantage_get_quote_amazon
+    ):
+        with freeze_time("2021-01-08T22:00:00Z") as frozen_time:
+            bot.get_price("AMZN")
+            frozen_time.move_to("2021-01-11T14:29:00Z")
+            bot.get_price("AMZN")
+
+        mock_alpha_vantage_get_quote_amazon.assert_called_once_with("AMZN")
+
+    @pytest.mark.parametrize(
+        "current_time, next_open",
+        [
+            ("2021-01-07T09:00:00Z", "2021-01-07T14:30:00Z"),
+            ("2021-01-07T21:00:00Z", "2021-01-08T14:30:00Z"),
+            ("2021-01-08T21:00:00Z", "2021-01-11T14:30:00Z"),
+            ("2021-01-09T15:00:00Z", "2021-01-11T14:30:00Z"),
+        ],
+    )
+    def test_calculates_next_market_open(self, current_time, next_open):
+        with freeze_time(current_time):
+            nyc_now = datetime.now(pytz.timezone("US/Eastern"))
+
+        assert bot.next_nasdaq_open(nyc_now) == parse(next_open)
@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import pytest
+from freezegun import freeze_time
+from prometheus_client import REGISTRY, generate_latest
+
+from src import bot, metrics, vendors
+from src.models import Outbox
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics:
+    @pytest.mark.usefixtures("mock_mention", "mock_alpha_vantage_get_intraday")
+    def test_counts_handled_mentions_and_times_each_stage(self):
+        handled = sample("stock_reminder_mentions_handled_total")
+        parsed = sample("stock_reminder_stage_seconds_count", stage="parse")
+
+        with freeze_time("2020-12-11T15:32:00Z"):
+            bot.reply_to_mentions()
+
+        assert sample("stock_reminder_mentions_handled_total") == handled + 1
+        assert sample("stock_reminder_stage_seconds_count", stage="parse") == parsed + 1
+        assert sample("stock_reminder_stage_seconds_count", stage="mention_fetch") > 0
+
+    def test_times_vendor_calls_by_endpoint_and_counts_errors(self):
+        calls = sample(
+            "stock_reminder_vendor_request_seconds_count",
+            vendor="test",
+            endpoint="quote",
+        )
+        errors = sample("stock_reminder_errors_total", stage="test", type="KeyError")
+
+        vendors.request("test", "quote", lambda: 1)
+        with pytest.raises(KeyError):
+            vendors.request("test", "quote", lambda: {}["price"])
+
+        assert (
+            sample(
+                "stock_reminder_vendor_request_seconds_count",
+                vendor="test",
+                endpoint="quote",
+            )
+            == calls + 2
+        )
+        assert (
+            sample("stock_reminder_errors_total", stage="test", type="KeyError")
+            == errors + 1
+        )
+
+    @pytest.mark.usefixtures(
+        "mock_tweepy",
+        "mock_giphy",
+        "mock_alpha_vantage_get_intraday",
+        "mock_alpha_vantage_get_company_overview_amazon",
+        "mock_alpha_vantage_get_daily_adjusted_amazon",
+    )
+    def test_reports_reminder_lag_and_published_reminders(self, reminder):
+        published = sample("stock_reminder_reminders_published_total")
+
+        with freeze_time(datetime(2021, 1, 15, 16, 55)):
+            bot.publish_reminders()
+            bot.send_outbox()
+
+        assert sample("stock_reminder_lag_seconds") == 180
+        assert sample("stock_reminder_reminders_published_total") == published + 1
+
+    @pytest.mark.usefixtures(
+        "mock_tweepy",
+        "mock_giphy",
+        "mock_alpha_vantage_get_intraday",
+        "mock_alpha_vantage_get_company_overview_amazon",
+        "mock_alpha_vantage_get_daily_adjusted_amazon",
+    )
+    def test_reports_reminder_lag_when_reminder_is_sent(self, reminder):
+        with freeze_time(datetime(2021, 1, 15, 16, 55)) as frozen_time:
+            bot.publish_reminders()
+            frozen_time.move_to(datetime(2021, 1, 15, 17, 10))
+            bot.send_outbox()
+
+        assert sample("stock_reminder_lag_seconds") == 1080
+
+    def test_reports_backlog_when_scraped(self, reminder):
+        with freeze_time(reminder.remind_on):
+            Outbox.enqueue(status="@user_name", in_reply_to_status_id=1)
+
+            assert sample("stock_reminder_backlog", queue="reminders") == 1
+            assert sample("stock_reminder_backlog", queue="outbox") == 1
+            assert b"stock_reminder_backlog" in generate_latest()
+
+    def test_serves_metrics_on_configured_port(self, monkeypatch):
+        served = []
+        monkeypatch.setattr(metrics, "start_http_server", served.append)
+
+        metrics.serve()
+
+        assert served == [8000]
+
+    def test_reports_cache_stats_when_scraped(self):
+        bot.quote_cache.set("AMZN", 3112.7, 60)
+        bot.quote_cache.get("AMZN")
+        bot.quote_cache.get("TSLA")
+
+        assert sample("stock_reminder_cache", cache="quote", stat="size") == 1
+        assert sample("stock_reminder_cache", cache="quote", stat="hits") == 1
+        assert sample("stock_reminder_cache", cache="quote", stat="misses") == 1
@@ -1,9 +1,24 @@
-from datetime import datetime
+import os
+import subprocess
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
 
 import pytest
 from freezegun import freeze_time
+from playhouse.db_url import connect
 
-from src.models import Reminder
+from src import const
+from src.models import (
+    CompanyOverview,
+    DailyPrice,
+    Outbox,
+    PooledMedia,
+    PriceHistory,
+    Reminder,
+    VendorCall,
+    add_missing_columns,
+)
 
 
 class TestReminder:
@@ -47,3 +62,294 @@ class TestReminder:
 
         with freeze_time(time):
             assert Reminder.due_now().count() == 0
+
+    @pytest.mark.usefixtures("reminder")
+    def test_returns_overdue_reminder_missed_by_a_previous_cycle(self):
+        with freeze_time(datetime(2021, 1, 20, 9, 0)):
+            assert Reminder.due_now().count() == 1
+
+    def test_claims_due_reminders_in_batches(self, reminder):
+        for tweet_id in range(2, 6):
+            Reminder.create(
+                user_name="user_name",
+                tweet_id=tweet_id,
+                created_on=reminder.created_on,
+                remind_on=reminder.remind_on,
+                stock_symbol="AMZN",
+                stock_price=2954.91,
+            )
+
+        with freeze_time(reminder.remind_on):
+            batches = [
+                Reminder.claim_due(token, batch_size=2)
+                for token in ["first", "second", "third", "fourth"]
+            ]
+
+        assert [[r.tweet_id for r in batch] for batch in batches] == [
+            [1, 2],
+            [3, 4],
+            [5],
+            [],
+        ]
+        assert [r.claimed_by for r in batches[1]] == ["second", "second"]
+
+    def test_claims_reminders_again_once_released_or_lease_expires(self, reminder):
+        with freeze_time(reminder.remind_on) as frozen_time:
+            assert Reminder.claim_due("first") == [reminder]
+            assert Reminder.release(["first"]) == 1
+            assert Reminder.claim_due("second") == [reminder]
+
+            frozen_time.tick(timedelta(minutes=const.CLAIM_LEASE_MINUTES - 1))
+            assert Reminder.claim_due("third") == []
+            frozen_time.tick(timedelta(minutes=2))
+            assert Reminder.claim_due("third") == [reminder]
+
+    def test_adds_lease_columns_to_existing_tables(self):
+        database = Reminder._meta.database
+        database.execute_sql("ALTER TABLE reminders DROP COLUMN claimed_by")
+
+        add_missing_columns(Reminder)
+
+        columns = [column.name for column in database.get_columns("reminders")]
+        assert "claimed_by" in columns
+
+    def test_indexes_unfinished_reminders_by_remind_on(self):
+        indexes = Reminder._meta.database.get_indexes("reminders")
+
+        assert "reminders_due_remind_on" in [index.name for index in indexes]
+
+    def test_migrates_database_from_url(self, tmp_path):
+        # The fixture database is bound by the tests, run migrations the way
+        # `make migrate` does instead
+        url = f"sqlite:///{tmp_path / 'default.db'}"
+        subprocess.run(
+            [sys.executable, "-m", "src.models"],
+            cwd=Path(__file__).parents[1],
+            env=dict(os.environ, DATABASE_URL=url),
+            check=True,
+        )
+
+        database = connect(url)
+        indexes = [index.name for index in database.get_indexes("reminders")]
+        indexes += [index.name for index in database.get_indexes("outbox")]
+        assert "reminders_due_remind_on" in indexes
+        assert "outbox_pending_send_after" in indexes
+
+    def test_creates_reminders_in_bulk(self):
+        values = {
+            "user_name": "user_name",
+            "tweet_id": 1,
+            "created_on": date(2020, 10, 15),
+            "remind_on": datetime(2021, 1, 15, 16, 52),
+            "stock_price": 2954.91,
+            "short": False,
+        }
+
+        Reminder.create_many(
+            [dict(values, stock_symbol=stock) for stock in ["AMZN", "MSFT", "AAPL"]]
+        )
+
+        assert [reminder.stock_symbol for reminder in Reminder.select()] == [
+            "AMZN",
+            "MSFT",
+            "AAPL",
+        ]
+
+    def test_finishes_reminders_in_bulk(self, reminder):
+        other_reminder = Reminder.create(
+            user_name="user_name",
+            tweet_id=2,
+            created_on=reminder.created_on,
+            remind_on=reminder.remind_on,
+            stock_symbol="MSFT",
+            stock_price=212.25,
+        )
+
+        with freeze_time(reminder.remind_on):
+            Reminder.claim_due("first")
+
+        assert Reminder.finish_many([reminder.id], "first") == [reminder.id]
+        assert reminder.refresh_from_db().is_finished is True
+        assert other_reminder.refresh_from_db().is_finished is False
+
+    def test_only_finishes_reminders_still_claimed_by_token(self, reminder):
+        with freeze_time(reminder.remind_on) as frozen_time:
+            Reminder.claim_due("first")
+            frozen_time.tick(timedelta(minutes=const.CLAIM_LEASE_MINUTES + 1))
+            Reminder.claim_due("second")
+
+        assert Reminder.finish_many([reminder.id], "first") == []
+        assert reminder.refresh_from_db().is_finished is False
+
+    def test_renews_lease_of_claimed_reminders(self, reminder):
+        with freeze_time(reminder.remind_on) as frozen_time:
+            Reminder.claim_due("first")
+            frozen_time.tick(timedelta(minutes=const.CLAIM_LEASE_MINUTES - 1))
+            assert Reminder.renew("first") == 1
+
+            frozen_time.tick(timedelta(minutes=2))
+            assert Reminder.claim_due("second") == []
+
+
+class TestCompanyOverview:
+    def test_returns_stored_overview_on_the_day_it_was_fetched(self):
+        with freeze_time("2021-01-07T09:00:00Z") as frozen_time:
+            CompanyOverview.store("AMZN", {"LastSplitDate": "1999-09-02"})
+            frozen_time.move_to("2021-01-07T23:00:00Z")
+
+            assert CompanyOverview.get_fresh("AMZN") == {"LastSplitDate": "1999-09-02"}
+
+    def test_does_not_return_overview_fetched_on_a_previous_day(self):
+        with freeze_time("2021-01-07T09:00:00Z") as frozen_time:
+            CompanyOverview.store("AMZN", {"LastSplitDate": "1999-09-02"})
+            frozen_time.move_to("2021-01-08T09:00:00Z")
+
+            assert CompanyOverview.get_fresh("AMZN") is None
+
+    def test_does_not_return_overview_older_than_an_hour_around_a_split(self):
+        with freeze_time("2020-08-31T09:00:00Z") as frozen_time:
+            CompanyOverview.store("TSLA", {"LastSplitDate": "2020-08-31"})
+            frozen_time.tick(timedelta(minutes=61))
+
+            assert CompanyOverview.get_fresh("TSLA") is None
+
+
+class TestDailyPrice:
+    @freeze_time("2020-12-31T22:00:00Z")
+    def test_sums_dividends_paid_within_window(self):
+        DailyPrice.store_history(
+            "JNJ",
+            [
+                (date(2020, 2, 21), 147.92, 0.95),
+                (date(2020, 5, 22), 146.07, 1.01),
+                (date(2020, 8, 24), 150.36, 1.01),
+                (date(2020, 11, 23), 144.29, 1.01),
+            ],
+            is_full=True,
+        )
+
+        assert (
+            DailyPrice.dividend_between("JNJ", date(2020, 2, 21), date(2020, 8, 24))
+            == 2.02
+        )
+        assert (
+            DailyPrice.dividend_between("JNJ", date(2020, 1, 1), date(2020, 12, 31))
+            == 3.98
+        )
+        assert (
+            DailyPrice.dividend_between("JNJ", date(2020, 11, 24), date(2020, 12, 31))
+            == 0.0
+        )
+
+    def test_appends_compact_top_up_to_stored_history(self):
+        with freeze_time("2020-12-30T22:00:00Z"):
+            DailyPrice.store_history(
+                "JNJ",
+                [(date(2020, 5, 22), 146.07, 1.01), (date(2020, 12, 30), 150.0, 0.0)],
+                is_full=True,
+            )
+        with freeze_time("2020-12-31T22:00:00Z"):
+            DailyPrice.store_history(
+                "JNJ",
+                [(date(2020, 12, 30), 156.05, 0.0), (date(2020, 12, 31), 157.38, 1.01)],
+                is_full=False,
+            )
+
+        history = PriceHistory.get(PriceHistory.stock_symbol == "JNJ")
+        assert history.is_full is True
+        assert DailyPrice.select().count() == 3
+        assert DailyPrice.get(DailyPrice.day == date(2020, 12, 30)).close == 156.05
+        assert (
+            DailyPrice.dividend_between("JNJ", date(2020, 1, 1), date(2020, 12, 31))
+            == 2.02
+        )
+
+
+class TestPooledMedia:
+    def test_picks_media_uploaded_for_sentiment_until_it_expires(self):
+        with freeze_time("2021-01-15T16:00:00Z") as frozen_time:
+            PooledMedia.add("positive", 1)
+            PooledMedia.add("negative", 2)
+
+            assert PooledMedia.pick("positive") == 1
+            assert PooledMedia.pick("zero") is None
+
+            frozen_time.tick(timedelta(hours=23))
+            assert PooledMedia.pick("positive") is None
+            assert PooledMedia.purge_expired() == 2
+
+
+class TestOutbox:
+    def test_backs_off_exponentially_until_it_gives_up(self):
+        with freeze_time("2021-01-15T16:00:00Z") as frozen_time:
+            message = Outbox.enqueue(status="Hello", in_reply_to_status_id=1)
+
+            message.retry_later(TimeoutError("timed out"))
+            assert list(Outbox.pending()) == []
+            frozen_time.tick(timedelta(seconds=30))
+            assert list(Outbox.pending()) == [message]
+
+            message.retry_later(TimeoutError("timed out"))
+            assert message.send_after == datetime(2021, 1, 15, 16, 1, 30)
+
+            for _ in range(3):
+                message.retry_later(TimeoutError("timed out"))
+            assert message.attempts == 5
+            assert message.failed_at is not None
+            frozen_time.tick(timedelta(days=1))
+            assert list(Outbox.pending()) == []
+
+    def test_only_attaches_media_when_present(self):
+        message = Outbox.enqueue(status="Hello", in_reply_to_status_id=1, media_id=2)
+
+        assert message.update_status_kwargs() == {
+            "status": "Hello",
+            "in_reply_to_status_id": 1,
+            "media_ids": [2],
+        }
+
+
+class TestVendorCall:
+    def test_aggregates_calls_per_day(self):
+        with freeze_time("2021-01-14"):
+            VendorCall.record(
+                "alpha_vantage", "get_intraday", "AMZN", "create", "ok", 1
+            )
+        with freeze_time("2021-01-15"):
+            VendorCall.record(
+                "alpha_vantage", "get_intraday", "AMZN", "create", "ok", 1
+            )
+            VendorCall.record(
+                "alpha_vantage", "get_intraday", "TSLA", "create", "ok", 3
+            )
+            VendorCall.record("fmp", "quote", "AMZN", "publish", "error", 1)
+
+            assert VendorCall.used_today("alpha_vantage") == 2
+
+        assert VendorCall.daily_usage(date(2021, 1, 15)) == [
+            {
+                "vendor": "alpha_vantage",
+                "endpoint": "get_intraday",
+                "purpose": "create",
+                "status": "ok",
+                "calls": 2,
+                "average_latency": 2,
+            },
+            {
+                "vendor": "fmp",
+                "endpoint": "quote",
+                "purpose": "publish",
+                "status": "error",
+                "calls": 1,
+                "average_latency": 1,
+            },
+        ]
+
+    def test_purges_calls_before_day(self):
+        with freeze_time("2021-01-14"):
+            VendorCall.record("fmp", "quote", "AMZN", "publish", "ok", 1)
+        with freeze_time("2021-01-15"):
+            VendorCall.record("fmp", "quote", "AMZN", "publish", "ok", 1)
+
+        assert VendorCall.purge_before(date(2021, 1, 15)) == 1
+        assert VendorCall.select().count() == 1
@@ -4,18 +4,18 @@ import pytest
 
 import pytz
 
-from src import bot
+from src import bot, tokenizer
 from freezegun import freeze_time
 
 
 class TestParseTweet:
     def test_returns_true_when_tweet_contains_cash_tag(self):
 
-        assert bot.contains_stock("What is the price of $AMZN?") is True
+        assert tokenizer.tokenize("What is the price of $AMZN?").cashtags == ["$AMZN"]
 
     def test_returns_false_when_tweet_does_not_contain_cash_tag(self):
 
-        assert bot.contains_stock("What is the price of amazon?") is False
+        assert tokenizer.tokenize("What is the price of amazon?").cashtags == []
 
     @pytest.mark.parametrize(
         "date_string",
@@ -23,11 +23,55 @@ class TestParseTweet:
     )
     def test_returns_true_when_tweet_contains_date(self, date_string):
 
-        assert bot.contains_date(f"Remind me of $AMZN in {date_string}") is True
+        intent = tokenizer.tokenize(f"Remind me of $AMZN in {date_string}")
 
-    def test_returns_false_when_tweet_does_not_contain_date(self):
+        assert intent.date_span is not None
 
-        assert bot.contains_date("Hello there!") is False
+    @pytest.mark.parametrize(
+        "tweet", ["Hello there!", "$AMZN 3", "$TSLA is a great buy at $660"]
+    )
+    def test_returns_false_when_tweet_does_not_contain_date(self, tweet):
+
+        assert tokenizer.tokenize(tweet).date_span is None
+
+    @pytest.mark.parametrize(
+        "tweet",
+        ["$msft 1/28/2021", "$AMZN on March 3rd", "$AMZN next friday", "$BTC at 3pm"],
+    )
+    def test_returns_true_when_tweet_contains_absolute_date(self, tweet):
+
+        assert tokenizer.tokenize(tweet).date_span is not None
+
+    @pytest.mark.parametrize(
+        "tweet, valid",
+        [
+            ("Remind me of $AMZN in 3 months", True),
+            ("Report for $AMZN", True),
+            ("What is the price of $AMZN?", False),
+            ("Remind me in 3 months", False),
+        ],
+    )
+    def test_validates_intent(self, tweet, valid):
+        assert tokenizer.is_valid(tokenizer.tokenize(tweet)) is valid
+
+    def test_tokenizes_tweet_into_intent(self):
+        tweet = "@stock_reminder Short $TSLA and $AMZN, report back in 3 months"
+
+        assert tokenizer.tokenize(tweet) == tokenizer.Intent(
+            cashtags=["$TSLA", "$AMZN"],
+            demands_report=True,
+            is_short=True,
+            date_span=(56, 61),
+            is_thread=False,
+        )
+
+    def test_flags_mentions_replying_to_another_tweet_as_threads(self, status):
+        status.in_reply_to_status_id = 2
+
+        intent = tokenizer.parse_mention(status)
+
+        assert intent.is_thread is True
+        assert intent.cashtags == ["$AMZN"]
 
     @pytest.mark.parametrize(
         "tweet, stock_tickers",
@@ -50,7 +94,7 @@ class TestParseTweet:
         self, tweet, stock_tickers
     ):
 
-        assert bot.parse_stock_symbols(tweet) == stock_tickers
+        assert tokenizer.tokenize(tweet).cashtags == stock_tickers
 
     @pytest.mark.parametrize(
         "string, reminder_date",
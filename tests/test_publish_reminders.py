@@ -1,9 +1,10 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 import pytest
-from unittest.mock import call, ANY
+from unittest.mock import call, patch, ANY, Mock
 
-from src import bot, const
+from src import bot, const, vendors
+from src.models import PooledMedia, Reminder
 from freezegun import freeze_time
 
 
@@ -18,19 +19,17 @@ class TestPublishReminders:
     ):
         with freeze_time(reminder.remind_on):
             bot.publish_reminders()
-
-        expected_calls = [
-            call().media_upload("random.gif"),
-            call().update_status(
-                status="@user_name 3 months ago you bought $AMZN at $2,954.91. "
-                "It is now worth $3,112.70. That's a return of 5.34%! 🚀🤑📈",
-                media_ids=[ANY],
-                in_reply_to_status_id=1,
-            ),
-        ]
+            bot.send_outbox()
 
         mock_giphy.assert_called_once_with(const.POSITIVE_RETURN_TAGS)
-        assert expected_calls in mock_tweepy.mock_calls
+        api = mock_tweepy.return_value
+        api.media_upload.assert_called_once_with("random.gif", file=ANY)
+        api.update_status.assert_called_once_with(
+            status="@user_name 3 months ago you bought $AMZN at $2,954.91. "
+            "It is now worth $3,112.70. That's a return of 5.34%! 🚀🤑📈",
+            media_ids=[ANY],
+            in_reply_to_status_id=1,
+        )
         assert reminder.refresh_from_db().is_finished is True
 
     @pytest.mark.usefixtures(
@@ -45,19 +44,17 @@ class TestPublishReminders:
         reminder.save()
         with freeze_time(reminder.remind_on):
             bot.publish_reminders()
-
-        expected_calls = [
-            call().media_upload("random.gif"),
-            call().update_status(
-                status="@user_name 3 months ago you bought $AMZN at $3,386.12. "
-                "It is now worth $3,112.70. That's a return of -8.07%! 😭📉",
-                media_ids=[ANY],
-                in_reply_to_status_id=1,
-            ),
-        ]
+            bot.send_outbox()
 
         mock_download_negative_returns_gif.assert_called_once()
-        assert expected_calls in mock_tweepy.mock_calls
+        api = mock_tweepy.return_value
+        api.media_upload.assert_called_once_with("random.gif", file=ANY)
+        api.update_status.assert_called_once_with(
+            status="@user_name 3 months ago you bought $AMZN at $3,386.12. "
+            "It is now worth $3,112.70. That's a return of -8.07%! 😭📉",
+            media_ids=[ANY],
+            in_reply_to_status_id=1,
+        )
         assert reminder.refresh_from_db().is_finished is True
 
     @pytest.mark.usefixtures(
@@ -72,18 +69,17 @@ class TestPublishReminders:
         reminder.save()
         with freeze_time(reminder.remind_on):
             bot.publish_reminders()
+            bot.send_outbox()
 
-        expected_calls = [
-            call().media_upload("random.gif"),
-            call().update_status(
-                status="@user_name 3 months ago you bought $AMZN at $3,112.70. "
-                "It is now worth $3,112.70. That's a return of 0.0%! 🤷‍♂️",
-                media_ids=[ANY],
-                in_reply_to_status_id=1,
-            ),
-        ]
         mock_giphy.assert_called_once_with(const.ZERO_RETURN_TAGS)
-        assert expected_calls in mock_tweepy.mock_calls
+        api = mock_tweepy.return_value
+        api.media_upload.assert_called_once_with("random.gif", file=ANY)
+        api.update_status.assert_called_once_with(
+            status="@user_name 3 months ago you bought $AMZN at $3,112.70. "
+            "It is now worth $3,112.70. That's a return of 0.0%! 🤷‍♂️",
+            media_ids=[ANY],
+            in_reply_to_status_id=1,
+        )
         assert reminder.refresh_from_db().is_finished is True
 
     @pytest.mark.usefixtures(
@@ -102,20 +98,18 @@ class TestPublishReminders:
 
         with freeze_time(reminder.remind_on):
             bot.publish_reminders()
-
-        expected_calls = [
-            call().media_upload("random.gif"),
-            call().update_status(
-                status="@user_name 4 months ago you bought $TSLA at $2,186.27 "
-                "($437.25 after adjusting for the stock split). It is "
-                "now worth $661.70. That's a return of 51.33%! 🚀🤑📈",
-                media_ids=[ANY],
-                in_reply_to_status_id=1,
-            ),
-        ]
+            bot.send_outbox()
 
         mock_giphy.assert_called_once_with(const.POSITIVE_RETURN_TAGS)
-        assert expected_calls in mock_tweepy.mock_calls
+        api = mock_tweepy.return_value
+        api.media_upload.assert_called_once_with("random.gif", file=ANY)
+        api.update_status.assert_called_once_with(
+            status="@user_name 4 months ago you bought $TSLA at $2,186.27 "
+            "($437.25 after adjusting for the stock split). It is "
+            "now worth $661.70. That's a return of 51.33%! 🚀🤑📈",
+            media_ids=[ANY],
+            in_reply_to_status_id=1,
+        )
         assert reminder.refresh_from_db().is_finished is True
 
     @pytest.mark.usefixtures(
@@ -135,20 +129,18 @@ class TestPublishReminders:
 
         with freeze_time(reminder.remind_on):
             bot.publish_reminders()
-
-        expected_calls = [
-            call().media_upload("random.gif"),
-            call().update_status(
-                status="@user_name 6 months ago you bought $JNJ at $149.60. "
-                "It is now worth $157.11 and a total dividend of "
-                "$1.01 was paid out. That's a return of 5.7%! 🚀🤑📈",
-                media_ids=[ANY],
-                in_reply_to_status_id=1,
-            ),
-        ]
+            bot.send_outbox()
 
         mock_giphy.assert_called_once_with(const.POSITIVE_RETURN_TAGS)
-        assert expected_calls in mock_tweepy.mock_calls
+        api = mock_tweepy.return_value
+        api.media_upload.assert_called_once_with("random.gif", file=ANY)
+        api.update_status.assert_called_once_with(
+            status="@user_name 6 months ago you bought $JNJ at $149.60. "
+            "It is now worth $157.11 and a total dividend of "
+            "$1.01 was paid out. That's a return of 5.7%! 🚀🤑📈",
+            media_ids=[ANY],
+            in_reply_to_status_id=1,
+        )
         assert reminder.refresh_from_db().is_finished is True
 
     @pytest.mark.usefixtures(
@@ -162,18 +154,16 @@ class TestPublishReminders:
         reminder.save()
         with freeze_time(reminder.remind_on):
             bot.publish_reminders()
+            bot.send_outbox()
 
-        expected_calls = [
-            call().media_upload("random.gif"),
-            call().update_status(
-                status="@user_name 3 months ago you shorted $AMZN at $2,954.91. "
-                "It is now worth $3,112.70. That's a return of -5.34%! 😭📉",
-                media_ids=[ANY],
-                in_reply_to_status_id=1,
-            ),
-        ]
-
-        assert expected_calls in mock_tweepy.mock_calls
+        api = mock_tweepy.return_value
+        api.media_upload.assert_called_once_with("random.gif", file=ANY)
+        api.update_status.assert_called_once_with(
+            status="@user_name 3 months ago you shorted $AMZN at $2,954.91. "
+            "It is now worth $3,112.70. That's a return of -5.34%! 😭📉",
+            media_ids=[ANY],
+            in_reply_to_status_id=1,
+        )
         assert reminder.refresh_from_db().is_finished is True
 
     def test_does_not_publish_reminder_when_reminder_date_is_not_today(
@@ -184,3 +174,266 @@ class TestPublishReminders:
 
         mock_tweepy.assert_not_called()
         assert reminder.refresh_from_db().is_finished is False
+
+    def test_fetches_market_data_once_per_stock_when_publishing_reminders(
+        self,
+        reminder,
+        mock_tweepy,
+        mock_giphy,
+        mock_download_negative_returns_gif,
+        mock_alpha_vantage_get_intraday,
+        mock_alpha_vantage_get_company_overview_amazon,
+        mock_alpha_vantage_get_daily_adjusted_amazon,
+    ):
+        other_reminder = Reminder.create(
+            user_name="other_user_name",
+            tweet_id=2,
+            created_on=date(2020, 10, 15),
+            remind_on=datetime(2021, 1, 15, 16, 52),
+            stock_symbol="AMZN",
+            stock_price=3386.12,
+        )
+        with freeze_time(reminder.remind_on):
+            bot.publish_reminders()
+            bot.send_outbox()
+
+        mock_alpha_vantage_get_intraday.assert_called_once_with("AMZN")
+        mock_alpha_vantage_get_company_overview_amazon.assert_called_once_with("AMZN")
+        mock_alpha_vantage_get_daily_adjusted_amazon.assert_called_once()
+        assert mock_tweepy.return_value.update_status.call_count == 2
+        assert reminder.refresh_from_db().is_finished is True
+        assert other_reminder.refresh_from_db().is_finished is True
+
+    @pytest.mark.usefixtures(
+        "mock_alpha_vantage_get_intraday_jnj",
+        "mock_alpha_vantage_get_company_overview_jnj",
+        "mock_giphy",
+        "mock_download_negative_returns_gif",
+    )
+    def test_tops_up_stored_price_history_with_compact_series(
+        self, reminder, mock_alpha_vantage_get_daily_adjusted_jnj
+    ):
+        reminder.created_on = date(2020, 6, 1)
+        reminder.remind_on = datetime(2020, 12, 30, 16, 0)
+        reminder.stock_symbol = "JNJ"
+        reminder.save()
+        Reminder.create(
+            user_name="other_user_name",
+            tweet_id=2,
+            created_on=date(2020, 6, 1),
+            remind_on=datetime(2020, 12, 30, 18, 0),
+            stock_symbol="JNJ",
+            stock_price=149.60,
+        )
+
+        with freeze_time(reminder.remind_on):
+            bot.publish_reminders()
+        with freeze_time(datetime(2020, 12, 30, 18, 0)):
+            bot.publish_reminders()
+
+        mock_alpha_vantage_get_daily_adjusted_jnj.assert_has_calls(
+            [call("JNJ", outputsize="full"), call("JNJ", outputsize="compact")]
+        )
+
+    def test_does_not_publish_reminder_when_vendor_request_is_deferred(
+        self, reminder, mock_tweepy
+    ):
+        with freeze_time(reminder.remind_on), patch(
+            "src.vendors.request", side_effect=vendors.RequestDeferred
+        ):
+            bot.publish_reminders()
+
+        mock_tweepy.return_value.update_status.assert_not_called()
+        assert reminder.refresh_from_db().is_finished is False
+        assert reminder.refresh_from_db().claimed_by is None
+
+    def test_skips_reminders_claimed_by_another_worker(self, reminder, mock_tweepy):
+        with freeze_time(reminder.remind_on):
+            Reminder.claim_due("other-worker")
+            bot.publish_reminders()
+
+        mock_tweepy.assert_not_called()
+        assert reminder.refresh_from_db().claimed_by == "other-worker"
+
+    @pytest.mark.usefixtures(
+        "mock_alpha_vantage_get_company_overview_amazon",
+        "mock_alpha_vantage_get_daily_adjusted_amazon",
+    )
+    def test_gives_up_on_reminder_when_market_data_keeps_failing(
+        self, reminder, mock_tweepy, mock_alpha_vantage_stock_not_found
+    ):
+        with freeze_time(reminder.remind_on) as frozen_time:
+            bot.publish_reminders()
+            bot.publish_reminders()
+
+            assert mock_alpha_vantage_stock_not_found.call_count == 1
+            assert reminder.refresh_from_db().is_finished is False
+
+            for _ in range(const.REMINDER_MAX_ATTEMPTS - 1):
+                frozen_time.tick(timedelta(seconds=const.REMINDER_RETRY_MAX_SECONDS))
+                bot.publish_reminders()
+            bot.send_outbox()
+
+        assert mock_alpha_vantage_stock_not_found.call_count == (
+            const.REMINDER_MAX_ATTEMPTS
+        )
+        assert reminder.refresh_from_db().is_finished is True
+        mock_tweepy.return_value.update_status.assert_called_once_with(
+            status="@user_name Sorry, I couldn't get the market data for your "
+            "reminder about $AMZN 😓",
+            in_reply_to_status_id=1,
+        )
+
+    @pytest.mark.usefixtures(
+        "mock_alpha_vantage_get_intraday",
+        "mock_alpha_vantage_get_company_overview_amazon",
+        "mock_alpha_vantage_get_daily_adjusted_amazon",
+    )
+    def test_leaves_reminders_reclaimed_by_another_worker_midway(
+        self, reminder, mock_tweepy, mock_giphy
+    ):
+        generate_results = bot.generate_investment_results_for_stock
+
+        def lose_lease(stock, reminders):
+            Reminder.update(claimed_by="other-worker").execute()
+            return generate_results(stock, reminders)
+
+        with freeze_time(reminder.remind_on), patch.object(
+            bot, "generate_investment_results_for_stock", lose_lease
+        ):
+            bot.publish_reminders()
+            bot.send_outbox()
+
+        mock_tweepy.return_value.update_status.assert_not_called()
+        assert reminder.refresh_from_db().is_finished is False
+
+    @pytest.mark.usefixtures(
+        "mock_alpha_vantage_get_intraday",
+        "mock_alpha_vantage_get_company_overview_amazon",
+        "mock_alpha_vantage_get_daily_adjusted_amazon",
+        "mock_giphy",
+    )
+    def test_renews_lease_while_a_slow_batch_is_published(self, reminder):
+        Reminder.create(
+            user_name="user_name",
+            tweet_id=2,
+            created_on=reminder.created_on,
+            remind_on=reminder.remind_on,
+            stock_symbol="TSLA",
+            stock_price=420.0,
+        )
+        generate_results = bot.generate_investment_results_for_stock
+
+        with freeze_time(reminder.remind_on) as frozen_time:
+
+            def slow_results(stock, reminders):
+                frozen_time.tick(timedelta(minutes=const.CLAIM_LEASE_MINUTES - 1))
+                return generate_results(stock, reminders)
+
+            with patch.object(
+                bot, "generate_investment_results_for_stock", slow_results
+            ), patch.object(Reminder, "renew", wraps=Reminder.renew) as mock_renew:
+                bot.publish_reminders()
+
+        assert mock_renew.call_count == 2
+
+    def test_downloads_gif_into_memory(self):
+        response = Mock(content=b"GIF89a")
+        with patch("src.vendors.http_get", return_value=response) as mock_get:
+            gif = bot.download_pre_selected_gif("https://media.giphy.com/x.gif")
+
+        mock_get.assert_called_once_with("https://media.giphy.com/x.gif")
+        assert gif.read() == b"GIF89a"
+
+    @pytest.mark.usefixtures(
+        "mock_alpha_vantage_get_intraday",
+        "mock_alpha_vantage_get_company_overview_amazon",
+        "mock_alpha_vantage_get_daily_adjusted_amazon",
+    )
+    def test_publishes_reminder_with_pooled_media(
+        self, reminder, mock_tweepy, mock_giphy
+    ):
+        with freeze_time(reminder.remind_on):
+            PooledMedia.add(const.POSITIVE_SENTIMENT, 1234)
+            bot.publish_reminders()
+            bot.send_outbox()
+
+        mock_giphy.assert_not_called()
+        mock_tweepy.return_value.media_upload.assert_not_called()
+        mock_tweepy.return_value.update_status.assert_called_once_with(
+            status=ANY, media_ids=[1234], in_reply_to_status_id=1
+        )
+
+
+class TestRefreshMediaPool:
+    @freeze_time("2021-01-15T16:00:00Z")
+    @pytest.mark.usefixtures("mock_giphy", "mock_download_negative_returns_gif")
+    def test_tops_up_each_sentiment_to_pool_size(self, mock_tweepy):
+        mock_tweepy.return_value.media_upload.return_value = Mock(media_id=1)
+        PooledMedia.add(const.ZERO_SENTIMENT, 2)
+
+        bot.refresh_media_pool()
+
+        assert mock_tweepy.return_value.media_upload.call_count == (
+            3 * const.MEDIA_POOL_SIZE - 1
+        )
+        for sentiment in const.SENTIMENT_EMOJIS:
+            assert PooledMedia.valid(sentiment).count() == const.MEDIA_POOL_SIZE
+
+    @pytest.mark.usefixtures("mock_download_negative_returns_gif")
+    def test_stops_refilling_sentiment_when_upload_fails(self, mock_tweepy, mock_giphy):
+        mock_tweepy.return_value.media_upload.return_value = Mock(media_id=1)
+        mock_giphy.side_effect = ValueError
+
+        bot.refresh_media_pool()
+
+        assert mock_giphy.call_count == 2
+        assert PooledMedia.valid(const.POSITIVE_SENTIMENT).count() == 0
+        assert PooledMedia.valid(const.NEGATIVE_SENTIMENT).count() == (
+            const.MEDIA_POOL_SIZE
+        )
+
+
+@pytest.mark.usefixtures("mock_giphy", "mock_download_negative_returns_gif")
+class TestPrefetchMarketData:
+    def test_leaves_only_the_price_to_fetch_when_reminder_is_due(
+        self,
+        reminder,
+        mock_tweepy,
+        mock_alpha_vantage_get_intraday,
+        mock_alpha_vantage_get_company_overview_amazon,
+        mock_alpha_vantage_get_daily_adjusted_amazon,
+    ):
+        with freeze_time(reminder.remind_on - timedelta(minutes=30)) as frozen_time:
+            bot.prefetch_market_data()
+
+            mock_alpha_vantage_get_intraday.assert_not_called()
+            mock_alpha_vantage_get_company_overview_amazon.assert_called_once()
+            mock_alpha_vantage_get_daily_adjusted_amazon.assert_called_once()
+            mock_tweepy.return_value.media_upload.assert_not_called()
+
+            frozen_time.move_to(reminder.remind_on)
+            bot.publish_reminders()
+
+        mock_alpha_vantage_get_intraday.assert_called_once_with("AMZN")
+        mock_alpha_vantage_get_company_overview_amazon.assert_called_once()
+        mock_alpha_vantage_get_daily_adjusted_amazon.assert_called_once()
+        assert reminder.refresh_from_db().is_finished is True
+
+    def test_does_not_prefetch_reminders_due_later(
+        self, reminder, mock_alpha_vantage_get_company_overview_amazon
+    ):
+        with freeze_time(reminder.remind_on - timedelta(hours=2)):
+            bot.prefetch_market_data()
+
+        mock_alpha_vantage_get_company_overview_amazon.assert_not_called()
+
+    @pytest.mark.usefixtures("mock_alpha_vantage_get_daily_adjusted_amazon")
+    def test_only_uses_spare_vendor_quota(
+        self, reminder, mock_alpha_vantage_get_company_overview_amazon
+    ):
+        with freeze_time(reminder.remind_on - timedelta(minutes=30)):
+            vendors.scheduler.exhaust(const.ALPHA_VANTAGE)
+            bot.prefetch_market_data()
+
+        mock_alpha_vantage_get_company_overview_amazon.assert_not_called()
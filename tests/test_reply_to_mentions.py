@@ -1,10 +1,13 @@
+import threading
 from datetime import date
 
 import pytest
-from unittest.mock import call
+from unittest.mock import call, patch
 
-from src import bot, const
-from src.models import Reminder
+from tweepy import Status, TweepError
+
+from src import bot, const, vendors
+from src.models import Cursor, Outbox, Reminder
 from freezegun import freeze_time
 
 
@@ -93,6 +96,7 @@ class TestReplyToMentions:
         self, mock_tweepy, mock_giphy
     ):
         bot.reply_to_mentions()
+        bot.send_outbox()
 
         expected_calls = [
             call().update_status(
@@ -109,6 +113,7 @@ class TestReplyToMentions:
     )
     def test_replies_to_mention_when_reminder_created(self, mock_tweepy, mock_giphy):
         bot.reply_to_mentions()
+        bot.send_outbox()
 
         expected_calls = [
             call().update_status(
@@ -128,6 +133,7 @@ class TestReplyToMentions:
     )
     def test_replies_when_multiple_reminders_created(self, mock_tweepy, mock_giphy):
         bot.reply_to_mentions()
+        bot.send_outbox()
 
         expected_calls = [
             call().update_status(
@@ -144,6 +150,7 @@ class TestReplyToMentions:
     @pytest.mark.usefixtures("mock_mention_with_invalid_format")
     def test_replies_with_help_message_when_mention_is_not_valid(self, mock_tweepy):
         bot.reply_to_mentions()
+        bot.send_outbox()
 
         expected_status_call = call().update_status(
             status="@user_name To create a reminder, mention me "
@@ -160,6 +167,7 @@ class TestReplyToMentions:
     @pytest.mark.usefixtures("mock_mention", "mock_alpha_vantage_stock_not_found")
     def test_replies_when_stock_is_not_found(self, mock_tweepy):
         bot.reply_to_mentions()
+        bot.send_outbox()
 
         expected_status_call = call().update_status(
             status=f"@user_name {const.STOCK_NOT_FOUND_RESPONSE}",
@@ -167,3 +175,144 @@ class TestReplyToMentions:
         )
 
         assert expected_status_call in mock_tweepy.mock_calls
+
+    @pytest.mark.usefixtures("mock_mention")
+    def test_does_not_reply_when_vendor_request_is_deferred(self, mock_tweepy):
+        with patch("src.vendors.request", side_effect=vendors.RequestDeferred):
+            bot.reply_to_mentions()
+
+        mock_tweepy.return_value.update_status.assert_not_called()
+        assert Reminder.select().count() == 0
+
+    @pytest.mark.usefixtures("mock_alpha_vantage_get_intraday")
+    def test_replies_to_remaining_mentions_when_one_of_them_fails(
+        self, mock_tweepy, status, twitter_user
+    ):
+        failing_status = Status()
+        failing_status.id = 2
+        failing_status.text = "Price of $TSLA in 3 months."
+        failing_status.user = twitter_user
+        failing_status.in_reply_to_status_id = None
+        mock_tweepy.return_value.mentions_timeline.return_value = [
+            failing_status,
+            status,
+        ]
+        mock_tweepy.return_value.update_status.side_effect = [
+            None,
+            TweepError("Failed to send request"),
+        ]
+
+        bot.reply_to_mentions()
+        bot.send_outbox()
+
+        assert Reminder.select().count() == 2
+        assert mock_tweepy.return_value.update_status.call_count == 2
+        assert Cursor.get_position(const.MENTIONS_CURSOR) == 2
+        assert Outbox.select().where(Outbox.attempts == 1).count() == 1
+
+    @pytest.mark.usefixtures("mock_mention")
+    def test_does_not_advance_cursor_past_deferred_mentions(self, mock_tweepy):
+        Cursor.advance(const.MENTIONS_CURSOR, 0)
+
+        with patch("src.vendors.request", side_effect=vendors.RequestDeferred):
+            bot.reply_to_mentions()
+
+        assert Cursor.get_position(const.MENTIONS_CURSOR) == 0
+
+    def test_does_not_answer_mentions_twice_after_a_deferral(
+        self, mock_tweepy, twitter_user, monkeypatch
+    ):
+        def mention(id, stock):
+            status = Status()
+            status.id = id
+            status.text = f"Remind me of ${stock} in 3 months."
+            status.user = twitter_user
+            status.in_reply_to_status_id = None
+            return status
+
+        # The second mention finishes while the first one waits for quota
+        second_started = threading.Event()
+
+        def deferring_price(stock):
+            if stock == "TSLA":
+                second_started.set()
+                return 661.7
+            second_started.wait(5)
+            raise vendors.RequestDeferred()
+
+        monkeypatch.setenv("MENTION_WORKERS", "2")
+        Cursor.advance(const.MENTIONS_CURSOR, 0)
+        mock_tweepy.return_value.mentions_timeline.side_effect = lambda **kwargs: (
+            [mention(2, "TSLA"), mention(1, "AMZN")] if kwargs["max_id"] is None else []
+        )
+
+        with patch("src.bot.get_price", side_effect=deferring_price):
+            bot.reply_to_mentions()
+        assert Cursor.get_position(const.MENTIONS_CURSOR) == 0
+        with patch("src.bot.get_price", return_value=3112.7):
+            bot.reply_to_mentions()
+
+        assert sorted(message.in_reply_to_status_id for message in Outbox.select()) == [
+            1,
+            2,
+        ]
+        assert sorted(reminder.tweet_id for reminder in Reminder.select()) == [1, 2]
+        assert Cursor.get_position(const.MENTIONS_CURSOR) == 2
+
+    @pytest.mark.usefixtures("mock_mention")
+    def test_retries_failed_mention_before_sending_help_message(self):
+        Cursor.advance(const.MENTIONS_CURSOR, 0)
+
+        with patch("src.bot.get_price", side_effect=RuntimeError):
+            for _ in range(const.MENTION_MAX_ATTEMPTS - 1):
+                bot.reply_to_mentions()
+                assert Cursor.get_position(const.MENTIONS_CURSOR) == 0
+                assert Outbox.select().count() == 0
+
+            bot.reply_to_mentions()
+
+        assert Cursor.get_position(const.MENTIONS_CURSOR) == 1
+        assert [message.status for message in Outbox.select()] == [
+            f"@user_name {const.HELP_MESSAGE}"
+        ]
+
+    @pytest.mark.usefixtures("mock_mention_with_invalid_format")
+    def test_reads_mentions_since_stored_cursor(self, mock_tweepy):
+        Cursor.advance(const.MENTIONS_CURSOR, 0)
+
+        bot.reply_to_mentions()
+
+        mock_tweepy.return_value.user_timeline.assert_not_called()
+        mock_tweepy.return_value.mentions_timeline.assert_any_call(
+            since_id=0, max_id=None, count=const.MENTIONS_PAGE_SIZE
+        )
+        assert Cursor.get_position(const.MENTIONS_CURSOR) == 1
+
+    def test_paginates_mentions_until_caught_up(self, mock_tweepy, twitter_user):
+        def mention(id):
+            status = Status()
+            status.id = id
+            status.text = "What stocks should I buy?"
+            status.user = twitter_user
+            status.in_reply_to_status_id = None
+            return status
+
+        Cursor.advance(const.MENTIONS_CURSOR, 0)
+        mock_tweepy.return_value.mentions_timeline.side_effect = [
+            [mention(4), mention(3)],
+            [mention(2), mention(1)],
+            [],
+        ]
+
+        bot.reply_to_mentions()
+        bot.send_outbox()
+
+        mock_tweepy.return_value.mentions_timeline.assert_has_calls(
+            [
+                call(since_id=0, max_id=None, count=const.MENTIONS_PAGE_SIZE),
+                call(since_id=0, max_id=2, count=const.MENTIONS_PAGE_SIZE),
+                call(since_id=0, max_id=0, count=const.MENTIONS_PAGE_SIZE),
+            ]
+        )
+        assert mock_tweepy.return_value.update_status.call_count == 4
+        assert Cursor.get_position(const.MENTIONS_CURSOR) == 4
@@ -1,7 +1,8 @@
 import pytest
-from unittest.mock import call, ANY
+from unittest.mock import call, patch, ANY
+from PIL import Image
 
-from src import bot
+from src import bot, const, tokenizer
 from freezegun import freeze_time
 
 
@@ -11,14 +12,14 @@ class TestReport:
         ["report for $JNJ", "analyse $AMZN info", "analyze $ETH"],
     )
     def test_returns_true_when_tweet_contains_report(self, tweet):
-        assert bot.demands_report(tweet) is True
+        assert tokenizer.tokenize(tweet).demands_report is True
 
     @pytest.mark.parametrize(
         "tweet",
         ["info about $JNJ", "should I buy $AMZN?"],
     )
     def test_returns_false_when_tweet_does_not_contain_report(self, tweet):
-        assert bot.demands_report(tweet) is False
+        assert tokenizer.tokenize(tweet).demands_report is False
 
     @pytest.mark.usefixtures(
         "mock_alpha_vantage_get_company_overview_amazon",
@@ -31,6 +32,7 @@ class TestReport:
     ):
         with freeze_time("2020-12-13T15:32:00Z"):
             bot.reply_to_mentions()
+            bot.send_outbox()
 
         expected_status_call = call().update_status(
             status="@user_name Knowledge is power! 🧠💪 Here is your company "
@@ -40,6 +42,22 @@ class TestReport:
         )
         assert expected_status_call in mock_tweepy.mock_calls
 
+    @pytest.mark.usefixtures("mock_mention_asking_for_report")
+    def test_replies_with_limit_message_when_report_budget_is_used_up(
+        self, mock_tweepy, monkeypatch
+    ):
+        monkeypatch.setitem(const.VENDOR_DAILY_BUDGETS, const.ALPHA_VANTAGE, 0)
+
+        with freeze_time("2020-12-13T15:32:00Z"):
+            bot.reply_to_mentions()
+            bot.send_outbox()
+
+        mock_tweepy.return_value.media_upload.assert_not_called()
+        mock_tweepy.return_value.update_status.assert_called_once_with(
+            status=f"@user_name {const.API_LIMIT_EXCEEDED_RESPONSE}",
+            in_reply_to_status_id=1,
+        )
+
     @pytest.mark.usefixtures(
         "mock_alpha_vantage_get_company_overview_amazon",
         "mock_mention_asking_for_report",
@@ -48,6 +66,7 @@ class TestReport:
     def test_replies_with_company_report_when_rating_not_available(self, mock_tweepy):
         with freeze_time("2020-12-13T15:32:00Z"):
             bot.reply_to_mentions()
+            bot.send_outbox()
 
         expected_status_call = call().update_status(
             status="@user_name Knowledge is power! 🧠💪 Here is your company "
@@ -67,6 +86,7 @@ class TestReport:
     ):
         with freeze_time("2020-12-13T15:32:00Z"):
             bot.reply_to_mentions()
+            bot.send_outbox()
 
         expected_status_call = call().update_status(
             status="@user_name Knowledge is power! 🧠💪 Here "
@@ -76,3 +96,114 @@ class TestReport:
         )
 
         assert expected_status_call in mock_tweepy.mock_calls
+
+    @pytest.mark.usefixtures(
+        "mock_mention_asking_for_report", "mock_fmp_api_rating_response"
+    )
+    def test_uses_stored_company_overview_when_generating_report(
+        self, mock_alpha_vantage_get_company_overview_amazon, status
+    ):
+        with freeze_time("2020-12-13T15:32:00Z"):
+            bot.reply_to_mentions()
+            status.id = 2
+            bot.reply_to_mentions()
+
+        mock_alpha_vantage_get_company_overview_amazon.assert_called_once_with("AMZN")
+
+    @pytest.mark.usefixtures(
+        "mock_alpha_vantage_get_company_overview_amazon",
+        "mock_mention_asking_for_report",
+        "mock_fmp_api_rating_response",
+    )
+    def test_uploads_report_image_from_memory(self, mock_tweepy, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        with freeze_time("2020-12-13T15:32:00Z"):
+            bot.reply_to_mentions()
+
+        _, kwargs = mock_tweepy.return_value.media_upload.call_args
+        assert kwargs["file"].getvalue().startswith(b"\x89PNG")
+        assert list(tmp_path.iterdir()) == []
+
+    def test_renders_report_table_with_pillow_by_default(self):
+        data = {field: "$1.00" for field in const.REPORT_FIELDS}
+
+        with patch("src.bot.dfi.export") as mock_export:
+            image = Image.open(bot.save_report_to_image(data))
+
+        mock_export.assert_not_called()
+        assert image.format == "PNG"
+        assert image.height == const.REPORT_FONT_SIZE * 2 * (len(data) + 1) + 8
+
+    def test_renders_header_only_table_for_empty_report(self):
+        image = Image.open(bot.save_report_to_image({}))
+
+        assert image.format == "PNG"
+        assert image.height == const.REPORT_FONT_SIZE * 2 + 8
+
+    def test_renders_report_table_with_dataframe_image_when_configured(
+        self, monkeypatch
+    ):
+        monkeypatch.setenv("REPORT_RENDERER", const.DATAFRAME_IMAGE_RENDERER)
+
+        with patch("src.bot.dfi.export") as mock_export:
+            bot.save_report_to_image({"Name": "Amazon.com Inc"})
+
+        mock_export.assert_called_once()
+
+    @pytest.mark.usefixtures(
+        "mock_alpha_vantage_get_company_overview_amazon",
+        "mock_mention_asking_for_report",
+    )
+    def test_answers_repeated_report_from_cache(
+        self, mock_tweepy, mock_fmp_api_rating_response, status
+    ):
+        with freeze_time("2020-12-13T15:32:00Z"):
+            bot.reply_to_mentions()
+            status.id = 2
+            bot.reply_to_mentions()
+            bot.send_outbox()
+
+        mock_tweepy.return_value.media_upload.assert_called_once()
+        assert mock_fmp_api_rating_response.call_count == 1
+        assert mock_tweepy.return_value.update_status.call_count == 2
+
+    @pytest.mark.usefixtures(
+        "mock_alpha_vantage_get_company_overview_amazon",
+        "mock_mention_asking_for_report",
+        "mock_fmp_api_rating_response",
+    )
+    def test_renders_report_again_on_next_trading_day(self, mock_tweepy, status):
+        with freeze_time("2020-12-13T15:32:00Z"):
+            bot.reply_to_mentions()
+        status.id = 2
+        with freeze_time("2020-12-14T15:32:00Z"):
+            bot.reply_to_mentions()
+
+        assert mock_tweepy.return_value.media_upload.call_count == 2
+
+    @pytest.mark.usefixtures("mock_mention_asking_for_crypto_report")
+    def test_caches_crypto_rating_for_the_day(
+        self, mock_alpha_vantage_crypto_rating, status
+    ):
+        with freeze_time("2020-12-13T15:32:00Z"):
+            bot.reply_to_mentions()
+            status.id = 2
+            bot.reply_to_mentions()
+
+        mock_alpha_vantage_crypto_rating.assert_called_once_with("ETH")
+
+    @freeze_time("2020-12-13T15:32:00-05:00")
+    def test_expires_reports_at_new_york_midnight(self):
+
+        assert bot.report_ttl() == (8 * 60 + 28) * 60
+
+    def test_leaves_company_overview_intact_when_generating_report(
+        self, mock_alpha_vantage_get_company_overview_amazon
+    ):
+        overview = mock_alpha_vantage_get_company_overview_amazon.return_value[0]
+        fields = dict(overview)
+
+        report = bot.generate_report("AMZN")
+
+        assert overview == fields
+        assert set(report) <= set(const.REPORT_FIELDS)
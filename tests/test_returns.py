@@ -0,0 +1,90 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from src import bot, const, returns
+from src.models import Reminder
+
+
+def make_reminders(entry_prices, shorts):
+    return [
+        Reminder(
+            user_name="user_name",
+            tweet_id=index,
+            created_on=date(2020, 10, 15),
+            remind_on=datetime(2021, 1, 15, 16, 52),
+            stock_symbol="AMZN",
+            stock_price=entry_price,
+            short=short,
+        )
+        for index, (entry_price, short) in enumerate(zip(entry_prices, shorts))
+    ]
+
+
+class TestReturns:
+    @pytest.mark.parametrize("value", [2.675, 1.005, 0.125, -0.001, -2.675, 1e-12])
+    def test_rounds_like_python_next_to_a_half(self, value):
+        rounded = returns.round_like_python(np.array([value]))
+
+        assert rounded.tolist() == [round(value, 2)]
+
+    def test_matches_scalar_returns(self):
+        rng = np.random.default_rng(0)
+        size = 10000
+        entry_prices = np.round(rng.uniform(1, 5000, size), 2)
+        current_prices = np.round(entry_prices * rng.uniform(0.2, 3, size), 2)
+        split_factors = rng.choice([1.0, 2.0, 5.0, 0.5], size)
+        dividends = np.round(rng.uniform(0, 5, size), 2) * (rng.random(size) < 0.3)
+        shorts = rng.random(size) < 0.2
+
+        adjusted, rates, sentiments = returns.investment_returns(
+            entry_prices, split_factors, dividends, current_prices, shorts
+        )
+
+        for index in range(size):
+            expected = bot.calculate_returns(
+                entry_prices[index] / split_factors[index],
+                current_prices[index],
+                dividends[index],
+            )
+            if shorts[index]:
+                expected *= -1
+            assert adjusted[index] == entry_prices[index] / split_factors[index]
+            assert str(rates[index]) == str(expected)
+
+    def test_buckets_sentiment_of_short_and_long_returns(self):
+        _, rates, sentiments = returns.investment_returns(
+            [100.0, 100.0, 100.0, 100.0],
+            [1.0, 1.0, 1.0, 1.0],
+            [0.0, 0.0, 0.0, 0.0],
+            [110.0, 90.0, 100.0, 100.0],
+            [False, True, False, True],
+        )
+
+        assert [str(rate) for rate in rates] == ["10.0", "10.0", "0.0", "-0.0"]
+        assert sentiments == [
+            const.POSITIVE_SENTIMENT,
+            const.POSITIVE_SENTIMENT,
+            const.ZERO_SENTIMENT,
+            const.ZERO_SENTIMENT,
+        ]
+
+    def test_batch_statuses_match_scalar_path(self):
+        reminders = make_reminders(
+            [2954.91, 3386.12, 3112.70, 2186.27], [False, False, True, True]
+        )
+        current_prices = [3112.70, 3112.70, 3112.70, 661.70]
+        split_factors = [1.0, 1.0, 1.0, 5.0]
+        dividends = [0.0, 1.01, 0.0, 0.0]
+
+        results = bot.generate_investment_results_batch(
+            reminders, current_prices, split_factors, dividends
+        )
+
+        assert results == [
+            (reminder, bot.generate_investment_results(reminder, *figures))
+            for reminder, figures in zip(
+                reminders, zip(current_prices, split_factors, dividends)
+            )
+        ]
@@ -0,0 +1,75 @@
+from unittest.mock import Mock, call, patch
+
+from freezegun import freeze_time
+from tweepy import RateLimitError, TweepError
+
+from src import bot, const, vendors
+from src.models import Outbox
+
+
+@freeze_time("2021-01-15T16:00:00Z")
+class TestSendOutbox:
+    def test_sends_pending_messages_in_order(self, mock_tweepy):
+        first = Outbox.enqueue(status="@user_name first", in_reply_to_status_id=1)
+        second = Outbox.enqueue(
+            status="@user_name second", in_reply_to_status_id=2, media_id=3
+        )
+
+        bot.send_outbox()
+
+        assert mock_tweepy.return_value.update_status.mock_calls == [
+            call(status="@user_name first", in_reply_to_status_id=1),
+            call(status="@user_name second", in_reply_to_status_id=2, media_ids=[3]),
+        ]
+        assert Outbox.get_by_id(first.id).sent_at is not None
+        assert Outbox.get_by_id(second.id).sent_at is not None
+        assert list(Outbox.pending()) == []
+
+    def test_retries_timed_out_messages_later(self, mock_tweepy):
+        message = Outbox.enqueue(status="@user_name", in_reply_to_status_id=1)
+        mock_tweepy.return_value.update_status.side_effect = TweepError(
+            "Failed to send request: Read timed out."
+        )
+
+        bot.send_outbox()
+
+        message = Outbox.get_by_id(message.id)
+        assert message.attempts == 1
+        assert message.sent_at is None
+        assert message.failed_at is None
+        assert "timed out" in message.last_error
+
+    def test_stops_sending_when_rate_limited(self, mock_tweepy):
+        Outbox.enqueue(status="@user_name first", in_reply_to_status_id=1)
+        Outbox.enqueue(status="@user_name second", in_reply_to_status_id=2)
+        mock_tweepy.return_value.update_status.side_effect = RateLimitError(
+            "Rate limit exceeded", Mock(status_code=429)
+        )
+
+        with patch.object(vendors.scheduler, "exhaust") as mock_exhaust:
+            bot.send_outbox()
+
+        mock_tweepy.return_value.update_status.assert_called_once()
+        mock_exhaust.assert_called_once_with(const.TWITTER)
+        assert [message.attempts for message in Outbox.select()] == [1, 0]
+
+    def test_drops_messages_twitter_rejects(self, mock_tweepy):
+        message = Outbox.enqueue(status="@user_name", in_reply_to_status_id=1)
+        mock_tweepy.return_value.update_status.side_effect = TweepError(
+            "Status is a duplicate.", Mock(status_code=403)
+        )
+
+        bot.send_outbox()
+
+        assert Outbox.get_by_id(message.id).failed_at is not None
+
+    def test_leaves_messages_queued_when_write_limit_is_used_up(self, mock_tweepy):
+        Outbox.enqueue(status="@user_name", in_reply_to_status_id=1)
+
+        with patch.object(
+            vendors.scheduler, "acquire", side_effect=vendors.RequestDeferred
+        ):
+            bot.send_outbox()
+
+        mock_tweepy.return_value.update_status.assert_not_called()
+        assert Outbox.pending().count() == 1
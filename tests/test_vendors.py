@@ -0,0 +1,145 @@
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from alpha_vantage import alphavantage
+from alpha_vantage.timeseries import TimeSeries
+
+from src import const, vendors
+from src.models import VendorCall
+
+
+@pytest.fixture
+def scheduler():
+    return vendors.RequestScheduler({"vendor": [(1, 0.2)]})
+
+
+class TestRequestScheduler:
+    def test_defers_request_when_quota_is_exhausted(self):
+        scheduler = vendors.RequestScheduler({"vendor": [(1, 60)]})
+        scheduler.request("vendor", "endpoint", Mock(), "AMZN")
+
+        with pytest.raises(vendors.RequestDeferred):
+            scheduler.request("vendor", "endpoint", Mock(), "AMZN")
+
+    def test_exhausts_quota_when_vendor_reports_limit_exceeded(self):
+        scheduler = vendors.RequestScheduler({"vendor": [(5, 600)]})
+        func = Mock(side_effect=ValueError(const.API_LIMIT_EXCEEDED_ERROR))
+        with pytest.raises(ValueError):
+            scheduler.request("vendor", "endpoint", func, "AMZN")
+
+        with pytest.raises(vendors.RequestDeferred):
+            scheduler.request("vendor", "endpoint", Mock(), "AMZN")
+
+    def test_coalesces_identical_requests_in_flight(self, scheduler):
+        release = threading.Event()
+        func = Mock(side_effect=lambda stock: release.wait() and stock)
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    scheduler.request("vendor", "endpoint", func, "AMZN")
+                )
+            )
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        func.assert_called_once_with("AMZN")
+        assert results == ["AMZN", "AMZN", "AMZN"]
+
+    def test_serves_higher_priority_requests_first(self, scheduler):
+        scheduler.request("vendor", "endpoint", Mock(), "AMZN")
+        served = []
+
+        def request(priority, stock):
+            with vendors.priority(priority):
+                scheduler.request("vendor", "endpoint", served.append, stock)
+
+        create = threading.Thread(target=request, args=(const.PRIORITY_CREATE, "TSLA"))
+        publish = threading.Thread(target=request, args=(const.PRIORITY_PUBLISH, "JNJ"))
+        create.start()
+        time.sleep(0.05)
+        publish.start()
+        create.join()
+        publish.join()
+
+        assert served == ["JNJ", "TSLA"]
+
+
+class TestVendorBudget:
+    def test_records_vendor_calls_in_ledger(self, scheduler):
+        with vendors.priority(const.PRIORITY_REPORT):
+            scheduler.request("vendor", "endpoint", Mock(), "AMZN", stock="AMZN")
+
+        call = VendorCall.get()
+        assert (call.vendor, call.endpoint, call.symbol) == (
+            "vendor",
+            "endpoint",
+            "AMZN",
+        )
+        assert call.purpose == "report"
+        assert call.status == const.CALL_SUCCEEDED
+        assert call.latency >= 0
+
+    def test_records_rate_limited_vendor_calls(self, scheduler):
+        func = Mock(side_effect=ValueError(const.API_LIMIT_EXCEEDED_ERROR))
+        with pytest.raises(ValueError):
+            scheduler.request("vendor", "endpoint", func, "AMZN", stock="AMZN")
+
+        assert VendorCall.get().status == const.CALL_RATE_LIMITED
+
+    def test_sheds_reports_before_publishing_as_budget_runs_out(
+        self, scheduler, monkeypatch, caplog
+    ):
+        monkeypatch.setitem(const.VENDOR_DAILY_BUDGETS, "vendor", 10)
+        for _ in range(8):
+            VendorCall.record("vendor", "endpoint", "AMZN", "create", "ok", 0.1)
+
+        with vendors.priority(const.PRIORITY_REPORT):
+            with pytest.raises(vendors.BudgetExceeded):
+                scheduler.request("vendor", "endpoint", Mock(), "AMZN")
+        with vendors.priority(const.PRIORITY_PUBLISH):
+            scheduler.request("vendor", "endpoint", Mock(), "AMZN")
+            scheduler.request("vendor", "endpoint", Mock(), "TSLA")
+
+        assert VendorCall.select().count() == 10
+        assert caplog.text.count("vendor has used") == 1
+
+
+class TestSharedClients:
+    def test_uses_shared_session_with_timeout_for_vendor_calls(self):
+        with patch.object(vendors.session, "get") as mock_get:
+            alphavantage.requests.get("https://www.alphavantage.co/query?")
+
+        mock_get.assert_called_once_with(
+            "https://www.alphavantage.co/query?", timeout=const.HTTP_TIMEOUT_SECONDS
+        )
+
+    def test_reuses_alpha_vantage_clients(self):
+        assert vendors.alpha_vantage_client(TimeSeries) is vendors.alpha_vantage_client(
+            TimeSeries
+        )
+
+    def test_builds_fmp_urls_from_configured_base_url(self, monkeypatch):
+        monkeypatch.setenv("FMP_API_URL", "http://localhost:8080/api/v3/")
+
+        assert (
+            vendors.fmp_url(const.FMP_API_GET_PRICE_ENDPOINT, "AMZN")
+            == "http://localhost:8080/api/v3/quote/AMZN?apikey=123"
+        )
+
+    def test_points_giphy_client_at_configured_base_url(self, monkeypatch):
+        monkeypatch.setenv("GIPHY_API_URL", "http://localhost:8080/v1")
+        vendors.giphy_api.cache_clear()
+
+        try:
+            assert vendors.giphy_api().api_client.host == "http://localhost:8080/v1"
+        finally:
+            vendors.giphy_api.cache_clear()